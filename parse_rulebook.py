@@ -1,19 +1,135 @@
 #!/usr/bin/env python3
 """
 Parse Hellenvald Core Rulebook PDF into structured markdown files.
+
+Raw per-page extraction results are cached on disk (see scripts/rulebook_cache.py),
+so re-running after a formatting change skips PyMuPDF entirely. Use --no-cache
+to extract everything again. A build manifest (see scripts/build_manifest.py)
+records what each chapter file was built from, so chapters whose pages, page
+range and formatting code are unchanged are skipped; --force rebuilds them all.
+With --extractor structured the section pages are read with PyMuPDF's font-aware
+get_text("dict") instead of plain text (see scripts/page_structure.py): headers
+and bullets come from font size and weight, and tables are placed where they
+occur on the page. Pages without a usable text layer (scans) are OCRed with
+Tesseract first, several at a time (see scripts/page_ocr.py); --no-ocr keeps
+their native text. With --jobs N the section pages are extracted and
+formatted by N worker processes, each with its own handle on the PDF; the
+output is identical to a sequential run. --low-memory releases PyMuPDF's caches
+after every page and, with --jobs, formats one chapter at a time instead of
+holding every formatted page; --memory-report prints time, peak RSS and the
+top tracemalloc allocators per stage (see scripts/pipeline_memory.py).
+Afterwards the chapters are added to the full-text search index (see
+scripts/rulebook_index.py) unless --no-index is given; only chapters whose
+files changed are re-indexed. The bestiary and
+equipment tables are also exported as typed records to rulebook/rulebook-data.json
+(see scripts/rulebook_data.py) unless --no-data is given.
 """
+import argparse
 import fitz  # PyMuPDF
+import multiprocessing
 import re
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+import page_ocr  # noqa: E402
+import page_structure  # noqa: E402
+import pipeline_memory  # noqa: E402
+import rulebook_markdown  # noqa: E402
+from build_manifest import BuildManifest  # noqa: E402
+from page_ocr import find_tesseract, ocr_pages  # noqa: E402
+from pipeline_memory import release_page_memory, stage  # noqa: E402
+from rulebook_data import export_rulebook_data  # noqa: E402
+from rulebook_index import INDEX_NAME, update_index  # noqa: E402
+from rulebook_cache import DEFAULT_CACHE_DIR, DEFAULT_OCR_CACHE_DIR, EXTRACTOR_VERSION, PageCache  # noqa: E402
+from rulebook_markdown import (  # noqa: E402
+    PARSE_STYLE, format_page_text, interleave, table_to_markdown, write_markdown,
+)
 
 PDF_PATH = "rulebook/Hellenvald Core Rulebook.pdf"
 OUTPUT_DIR = "rulebook"
+TOC_PAGE_INDEX = 6
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Parse the rulebook PDF into markdown files.")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR),
+                        help="page extraction cache directory (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="extract every page from the PDF without reading or writing the cache")
+    parser.add_argument("--force", action="store_true",
+                        help="rebuild every chapter even if the build manifest says it is up to date")
+    parser.add_argument("--extractor", choices=["text", "structured"], default="text",
+                        help="page extraction for section pages (default: %(default)s)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="worker processes for page extraction (default: %(default)s)")
+    parser.add_argument("--no-ocr", action="store_true",
+                        help="keep the native text of pages without a text layer instead of OCRing them")
+    parser.add_argument("--ocr-jobs", type=int, default=os.cpu_count() or 1,
+                        help="Tesseract processes run at once (default: %(default)s)")
+    parser.add_argument("--low-memory", action="store_true",
+                        help="release PDF caches after every page and format one chapter at a time")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="print time, peak RSS and top allocators per stage (this process only; "
+                             "use --jobs 1 to include extraction)")
+    parser.add_argument("--index", default=os.path.join(OUTPUT_DIR, INDEX_NAME),
+                        help="full-text search index to update (default: %(default)s, "
+                             "next to the chapters it indexes)")
+    parser.add_argument("--no-index", action="store_true",
+                        help="do not update the search index")
+    parser.add_argument("--no-data", action="store_true",
+                        help="do not export the bestiary and equipment tables to JSON")
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.ocr_jobs < 1:
+        parser.error("--ocr-jobs must be at least 1")
+    return args
+
+def extract_page(doc, page_idx, cache=None, extractor="text", ocr_texts=None):
+    """Return the raw extraction of a page, from the cache when possible
+
+    "text": {'text', 'tables'}; "structured": {'lines', 'tables'} from
+    page_structure.extract_structured. Pages in ocr_texts (see
+    page_ocr.ocr_pages) are {'text', 'tables', 'ocr'} with either extractor;
+    ocr_texts is None when OCR did not run.
+    """
+    if cache is not None:
+        cached = cache.get(page_idx, extractor)
+        if cached is not None:
+            return cached
+
+    ocr_ran = ocr_texts is not None
+    ocr_texts = ocr_texts or {}
+    page = doc[page_idx]
+    if ocr_texts.get(page_idx) is not None:
+        # A scan: no text layer to take fonts or tables from
+        extracted = {'text': ocr_texts[page_idx], 'tables': [], 'ocr': True}
+    elif extractor == "structured":
+        extracted = page_structure.extract_structured(page)
+    else:
+        with stage("text"):
+            text = page.get_text()
+        with stage("tables"):
+            tables = page_structure.extract_tables(page)
+        extracted = {'text': text, 'tables': tables}
+    # A scan that was not OCRed (no Tesseract, or OCR off) is not cached, so a
+    # later run can; runs with OCR only OCR pages the cache does not have
+    if cache is not None:
+        if ocr_ran:
+            unread_scan = page_idx in ocr_texts and ocr_texts[page_idx] is None
+        else:
+            unread_scan = page_ocr.is_scan(page, extracted.get('text'))
+        if not unread_scan:
+            cache.put(page_idx, extracted, extractor)
+    return extracted
 
-def extract_toc(doc):
+def extract_toc(doc, cache=None):
     """Extract table of contents from page 7 (index 6)"""
     # Page 7 in the document (0-indexed as 6)
-    toc_page = doc[6]
-    text = toc_page.get_text()
+    text = extract_page(doc, TOC_PAGE_INDEX, cache)['text']
 
     print("TOC Page Text Preview:")
     print(text[:1000])
@@ -58,333 +174,118 @@ def extract_toc(doc):
 
     return toc_entries
 
-def clean_text(text):
-    """Clean extracted text"""
-    # Remove page markers
-    text = re.sub(r'--- PAGE \d+ ---', '', text)
-    # Remove font tags
-    text = re.sub(r'<[^>]+>', '', text)
-    return text.strip()
-
-def detect_and_format_tables(lines):
-    """Detect tables and format them as markdown tables"""
-    result = []
-    i = 0
-
-    while i < len(lines):
-        # Check if we're at the start of a table
-        # Tables often have a header row in all caps or mixed case
-        # followed by rows of data
-
-        # Look for patterns like: word, number pattern repeated
-        if i + 5 < len(lines):  # Need at least a few lines for a table
-            # Collect potential table rows
-            potential_table = []
-            header_line = None
-
-            # Check if current line could be a header (multiple words/columns)
-            current = lines[i].strip()
-
-            # Skip empty lines
-            if not current:
-                result.append(lines[i])
-                i += 1
-                continue
-
-            # Look ahead to see if we have table-like structure
-            # (multiple short lines that could be cell values)
-            lookahead = []
-            j = i
-            while j < min(i + 30, len(lines)):
-                line = lines[j].strip()
-                if not line:
-                    break
-                lookahead.append(line)
-                j += 1
-
-            # Try to detect table pattern
-            # Tables often have: header words, then repeated numeric/text patterns
-            table_detected = False
-
-            # Pattern 1: Multiple consecutive short lines (likely table cells)
-            if len(lookahead) > 6:
-                short_lines = sum(1 for line in lookahead[:15] if len(line) < 30 and line)
-                if short_lines > 8:
-                    # This might be a table with cells on separate lines
-                    # Try to reconstruct it
-                    table_detected = True
-
-                    # Find the header - usually starts with words
-                    header_idx = 0
-                    while header_idx < len(lookahead) and re.match(r'^\d+$', lookahead[header_idx]):
-                        header_idx += 1
-
-                    if header_idx < len(lookahead):
-                        # Try to determine number of columns by finding patterns
-                        # For now, use a simple heuristic: look for repeating structure
-
-                        # Common pattern: header row with multiple words on one or multiple lines
-                        # then rows of data
-
-                        # Let's try to parse the table structure
-                        parsed_table = parse_table_structure(lookahead)
-                        if parsed_table:
-                            result.append(format_markdown_table(parsed_table))
-                            i = j
-                            continue
-
-            result.append(lines[i])
-            i += 1
-        else:
-            result.append(lines[i])
-            i += 1
-
-    return result
-
-def parse_table_structure(lines):
-    """Try to parse table structure from lines"""
-    # This is a simple heuristic-based parser
-    # Look for repeating patterns
-
-    # Skip leading numbers that might be page numbers
-    start_idx = 0
-    while start_idx < len(lines) and re.match(r'^\d+$', lines[start_idx].strip()):
-        start_idx += 1
-
-    if start_idx >= len(lines):
-        return None
-
-    # Collect header words (usually at the start)
-    headers = []
-    idx = start_idx
-
-    # Headers are usually a sequence of words before the data
-    # Look for capitalized words or specific patterns
-    while idx < len(lines) and len(headers) < 10:
-        line = lines[idx].strip()
-        # If line looks like a header (word or phrase, not pure number)
-        if line and not re.match(r'^[+\-]?\d+d?\d*$', line):
-            # Check if it's a reasonable header
-            if re.search(r'[а-яА-ЯёЁ]', line) and len(line) < 50:
-                # Could be header or header continuation
-                if not headers or len(line.split()) <= 3:
-                    headers.append(line)
-                    idx += 1
-                else:
-                    break
-            else:
-                break
-        else:
-            break
-
-    # If we didn't find good headers, abort
-    if len(headers) < 2:
-        return None
-
-    # Now try to find data rows
-    # Data rows often have a mix of numbers and text
-    rows = []
-    current_row = []
-
-    while idx < len(lines):
-        line = lines[idx].strip()
-
-        if not line:
-            # Empty line might end the table
-            if current_row:
-                # Pad row to match header count
-                while len(current_row) < len(headers):
-                    current_row.append('')
-                rows.append(current_row[:len(headers)])
-                current_row = []
-            break
-
-        # Add to current row
-        current_row.append(line)
-
-        # Check if we have enough cells for a complete row
-        if len(current_row) >= len(headers):
-            rows.append(current_row[:len(headers)])
-            current_row = []
-
-        idx += 1
-
-        # Safety limit
-        if len(rows) > 50:
-            break
-
-    # Add any remaining cells
-    if current_row:
-        while len(current_row) < len(headers):
-            current_row.append('')
-        rows.append(current_row[:len(headers)])
-
-    # Need at least one data row
-    if not rows:
-        return None
-
-    return {'headers': headers, 'rows': rows}
-
-def format_markdown_table(table):
-    """Format parsed table as markdown"""
-    headers = table['headers']
-    rows = table['rows']
-
-    # Create header row
-    header_row = '| ' + ' | '.join(headers) + ' |'
-    separator = '| ' + ' | '.join(['---' for _ in headers]) + ' |'
-
-    # Create data rows
-    data_rows = []
-    for row in rows:
-        # Ensure row has same number of columns as headers
-        padded_row = row + [''] * (len(headers) - len(row))
-        data_rows.append('| ' + ' | '.join(padded_row[:len(headers)]) + ' |')
-
-    return '\n' + header_row + '\n' + separator + '\n' + '\n'.join(data_rows) + '\n'
-
-def text_to_markdown(text, page_nums):
-    """Convert extracted text to markdown with improved formatting"""
-    lines = text.split('\n')
-    md_lines = []
-
-    # Track current page number
-    current_page_idx = 0
-
-    # Process lines
-    i = 0
-    while i < len(lines):
-        line = lines[i].rstrip()
-
-        # Skip empty lines
-        if not line.strip():
-            md_lines.append('')
-            i += 1
-            continue
-
-        stripped = line.strip()
-
-        # Check if it's a header (all caps Russian text, relatively short)
-        if re.match(r'^[А-ЯЁ\s\-]+$', stripped) and 2 <= len(stripped) <= 50:
-            md_lines.append(f"## {stripped}")
-            i += 1
-            continue
-
-        # Check if it's a bullet point
-        if stripped.startswith('•'):
-            md_lines.append(f"- {stripped[1:].strip()}")
-            i += 1
-            continue
-
-        # Regular paragraph text
-        md_lines.append(stripped)
-        i += 1
-
-    return '\n'.join(md_lines)
-
-def format_markdown(text):
-    """Format extracted text as proper markdown"""
-    lines = text.split('\n')
-    md_lines = []
-
-    i = 0
-    while i < len(lines):
-        line = lines[i].rstrip()
-
-        # Skip empty lines
-        if not line.strip():
-            md_lines.append('')
-            i += 1
-            continue
-
-        stripped = line.strip()
-
-        # Check if it's a header (all caps Russian text, relatively short)
-        if re.match(r'^[А-ЯЁ\s\-\(\)]+$', stripped) and 2 <= len(stripped) <= 60 and not stripped.isdigit():
-            md_lines.append(f"\n## {stripped}\n")
-            i += 1
-            continue
-
-        # Check if it's a bullet point
-        if stripped.startswith('•'):
-            md_lines.append(f"- {stripped[1:].strip()}")
-            i += 1
-            continue
-
-        # Regular paragraph text
-        md_lines.append(stripped)
-        i += 1
-
-    return '\n'.join(md_lines)
-
-def extract_section(doc, start_page, end_page, title):
-    """Extract a section from the PDF with table detection"""
+def section_page_indices(page_count, start_page, end_page):
+    """PDF page indices (0-based) of a section given its TOC page numbers"""
     # PDF uses 0-based indexing, but TOC uses 1-based page numbers
     # Offset calculated from: Character Creation is at book page 6, PDF page 13
     # Offset = 13 - 6 = 7
-
-    pages_content = []
-    page_nums = []
-
     offset = 7
+    stop = (end_page - 1 + offset + 1) if end_page else page_count
+    return range(start_page - 1 + offset, min(stop, page_count))
+
+def iter_page_markdown(doc, page_idx, cache=None, with_tables=True, extractor="text", ocr_texts=None):
+    """Yield the markdown of one page in pieces"""
+    extracted = extract_page(doc, page_idx, cache, extractor, ocr_texts)
+    if 'lines' in extracted:
+        yield from page_structure.iter_structured_markdown(extracted, with_tables)
+        return
 
-    for page_idx in range(start_page - 1 + offset, ((end_page - 1 + offset + 1) if end_page else len(doc))):
-        if page_idx >= len(doc):
-            break
-        page = doc[page_idx]
-
-        # Try to find tables on this page
-        try:
-            tables = page.find_tables()
-            table_data = []
-
-            if tables and tables.tables:
-                for table in tables.tables:
-                    # Extract table as pandas dataframe or dict
-                    try:
-                        df = table.to_pandas()
-                        if df is not None and not df.empty:
-                            table_data.append({
-                                'bbox': table.bbox,
-                                'data': df
-                            })
-                    except:
-                        pass
-        except:
-            tables = None
-            table_data = []
-
-        # Get text
-        text = page.get_text()
-        cleaned = clean_text(text)
-
-        # If we found tables, try to replace them in the text
-        if table_data:
-            content = format_markdown_with_tables(cleaned, table_data)
-        else:
-            content = format_markdown(cleaned)
-
-        # Add page marker and content
-        pages_content.append(f"<!-- PDF Page {page_idx + 1} -->\n\n{content}")
-        page_nums.append(page_idx + 1)
-
-    return '\n\n'.join(pages_content), page_nums
+    yield from interleave(format_page_text(extracted['text'], PARSE_STYLE))
 
-def format_markdown_with_tables(text, table_data):
-    """Format markdown with extracted tables"""
-    # For now, just append tables at the end
-    # A more sophisticated approach would be to insert them at the right position
-    result = format_markdown(text)
+    if with_tables:
+        # For now, just append tables at the end
+        # A more sophisticated approach would be to insert them at the right position
+        yield from iter_markdown_tables(extracted['tables'])
 
+def iter_markdown_tables(table_data):
+    """Yield extracted tables as markdown, each preceded by a blank line"""
     for table_info in table_data:
-        df = table_info['data']
-        # Convert dataframe to markdown table
-        md_table = '\n' + df.to_markdown(index=False) + '\n'
-        result += '\n' + md_table
-
-    return result
+        markdown = table_to_markdown(table_info['rows'])
+        if markdown:
+            yield '\n\n' + markdown + '\n'
+
+def format_page(doc, page_idx, cache=None, extractor="text", with_tables=True, ocr_texts=None):
+    """Extract a page and format it as markdown"""
+    with stage("formatting"):
+        return ''.join(iter_page_markdown(doc, page_idx, cache, with_tables, extractor, ocr_texts))
+
+def _format_page_range(pdf_path, page_indices, cache, extractor="text", low_memory=False, ocr_texts=None):
+    """Pool worker: open the PDF separately and format a run of pages"""
+    if cache is not None:
+        # The cache arrives as a copy of the parent's; count this run only.
+        cache.hits = cache.misses = 0
+
+    doc = fitz.open(pdf_path)
+    try:
+        formatted = {}
+        for page_idx in page_indices:
+            formatted[page_idx] = format_page(doc, page_idx, cache, extractor, ocr_texts=ocr_texts)
+            if low_memory:
+                release_page_memory()
+    finally:
+        doc.close()
+    stats = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    return formatted, stats
+
+def page_pool(jobs):
+    """Worker processes for format_pages_parallel"""
+    # spawn: MuPDF state must not be shared with a forked parent.
+    return ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("spawn"))
+
+def format_pages_parallel(pdf_path, page_indices, cache, jobs, extractor="text", low_memory=False, pool=None,
+                          ocr_texts=None):
+    """Format pages in worker processes; returns {page_idx: markdown}
+
+    A pool from page_pool() is reused if given, otherwise one is started for
+    this call.
+    """
+    if pool is None:
+        with page_pool(jobs) as pool:
+            return format_pages_parallel(pdf_path, page_indices, cache, jobs, extractor, low_memory, pool,
+                                         ocr_texts)
+
+    # Several contiguous runs per worker, so uneven pages even out while each
+    # worker still reads neighbouring pages.
+    run_length = max(1, -(-len(page_indices) // (jobs * 4)))
+    runs = [page_indices[i:i + run_length] for i in range(0, len(page_indices), run_length)]
+
+    # Each run only needs the OCR text of its own pages
+    if ocr_texts is None:
+        run_ocr_texts = [None] * len(runs)
+    else:
+        run_ocr_texts = [{page_idx: ocr_texts[page_idx] for page_idx in run if page_idx in ocr_texts}
+                         for run in runs]
+
+    formatted = {}
+    for run_formatted, (hits, misses) in pool.map(
+        _format_page_range, [pdf_path] * len(runs), runs, [cache] * len(runs),
+        [extractor] * len(runs), [low_memory] * len(runs), run_ocr_texts
+    ):
+        formatted.update(run_formatted)
+        if cache is not None:
+            cache.hits += hits
+            cache.misses += misses
+    return formatted
+
+def iter_chapter_markdown(doc, title, page_indices, cache=None, formatted_pages=None, with_tables=True,
+                          extractor="text", low_memory=False, ocr_texts=None):
+    """Yield a chapter file's markdown page by page"""
+    yield f"# {title}\n\n"
+
+    for position, page_idx in enumerate(page_indices):
+        if position:
+            yield '\n\n'
+        # Add page marker and content
+        yield f"<!-- PDF Page {page_idx + 1} -->\n\n"
+        if formatted_pages is not None and page_idx in formatted_pages:
+            yield formatted_pages[page_idx]
+        else:
+            yield format_page(doc, page_idx, cache, extractor, with_tables, ocr_texts)
+            if low_memory:
+                release_page_memory()
 
-def parse_pdf():
+def parse_pdf(cache_dir=None, jobs=1, force=False, index_path=None, export_data=True, extractor="text",
+              low_memory=False, ocr=True, ocr_jobs=1):
     """Main parsing function"""
     if not os.path.exists(PDF_PATH):
         print(f"Error: PDF not found at {PDF_PATH}")
@@ -394,8 +295,11 @@ def parse_pdf():
     doc = fitz.open(PDF_PATH)
     print(f"Total pages: {len(doc)}\n")
 
+    cache = PageCache(cache_dir, PDF_PATH) if cache_dir else None
+
     # Extract TOC
-    toc_entries = extract_toc(doc)
+    with stage("toc"):
+        toc_entries = extract_toc(doc, cache)
 
     if not toc_entries:
         print("No TOC entries found. Please check the PDF structure.")
@@ -471,40 +375,112 @@ def parse_pdf():
         "title": "Table of Contents",
         "start_page": -1,  # Special marker for TOC
         "end_page": -1,
-        "pdf_page": 6  # Direct PDF page index
+        "pdf_page": TOC_PAGE_INDEX  # Direct PDF page index
     })
 
-    # Extract and save each section
+    # Skip chapters whose inputs match the build manifest
+    # Scans come out differently once Tesseract is installed
+    manifest = BuildManifest(OUTPUT_DIR,
+                             [__file__, rulebook_markdown.__file__, page_structure.__file__, page_ocr.__file__],
+                             {"extractor": EXTRACTOR_VERSION, "pageExtractor": extractor,
+                              "ocr": ocr and find_tesseract() is not None})
+    stale_chapters = []
+    skipped = []
     for chapter in chapters_to_extract:
+        if "pdf_page" in chapter:
+            chapter["pages"] = [chapter["pdf_page"]]
+        else:
+            chapter["pages"] = list(section_page_indices(len(doc), chapter["start_page"], chapter["end_page"]))
+        chapter["inputs"] = manifest.inputs(doc, chapter["pages"], title=chapter["title"])
+
+        if force or not manifest.is_current(chapter["filename"], chapter["inputs"]):
+            stale_chapters.append(chapter)
+        else:
+            skipped.append(chapter["filename"])
+
+    section_pages = sorted({
+        page_idx
+        for chapter in stale_chapters if "pdf_page" not in chapter
+        for page_idx in chapter["pages"]
+    })
+
+    # Scans are OCRed before formatting, so Tesseract can work on several at once
+    ocr_texts = None
+    if ocr:
+        with stage("ocr"):
+            ocr_texts = ocr_pages(
+                doc,
+                [page_idx for page_idx in section_pages if cache is None or not cache.has(page_idx, extractor)],
+                DEFAULT_OCR_CACHE_DIR,
+                ocr_jobs,
+            )
+
+    formatted_pages = None
+    # With --low-memory the workers format one chapter at a time
+    pool = page_pool(jobs) if jobs > 1 and low_memory else None
+    if jobs > 1 and not low_memory:
+        print(f"Formatting {len(section_pages)} pages with {jobs} worker processes\n")
+        formatted_pages = format_pages_parallel(PDF_PATH, section_pages, cache, jobs, extractor,
+                                                ocr_texts=ocr_texts)
+
+    # Extract and save each section
+    for chapter in stale_chapters:
         filename = chapter["filename"]
         title = chapter["title"]
-        start_page = chapter["start_page"]
-        end_page = chapter["end_page"]
+        output_path = os.path.join(OUTPUT_DIR, filename)
 
-        # Handle special case for TOC
+        # Handle special case for TOC: the page is written as text only
         if "pdf_page" in chapter:
             print(f"Extracting: {title} (PDF page {chapter['pdf_page'] + 1})")
-            page = doc[chapter["pdf_page"]]
-            text = page.get_text()
-            content = f"<!-- PDF Page {chapter['pdf_page'] + 1} -->\n\n{format_markdown(clean_text(text))}"
-            page_nums = [chapter['pdf_page'] + 1]
+            pieces = iter_chapter_markdown(doc, title, chapter["pages"], cache, with_tables=False)
         else:
-            print(f"Extracting: {title} (pages {start_page}-{end_page or 'end'})")
-            content, page_nums = extract_section(doc, start_page, end_page, title)
-
-        output_path = os.path.join(OUTPUT_DIR, filename)
-
-        # Create markdown content (page markers are already in content from extract_section)
-        md_content = f"# {title}\n\n{content}"
+            print(f"Extracting: {title} (pages {chapter['start_page']}-{chapter['end_page'] or 'end'})")
+            if pool is not None:
+                formatted_pages = format_pages_parallel(PDF_PATH, chapter["pages"], cache, jobs, extractor,
+                                                        low_memory, pool, ocr_texts)
+            pieces = iter_chapter_markdown(doc, title, chapter["pages"], cache, formatted_pages,
+                                           extractor=extractor, low_memory=low_memory, ocr_texts=ocr_texts)
+
+        # Stream pages into the file as they are formatted
+        with stage("write"):
+            write_markdown(output_path, pieces)
+        if low_memory:
+            formatted_pages = None
+
+        manifest.record(filename, chapter["inputs"])
+        print(f"  Saved to: {output_path}\n")
 
-        # Save
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(md_content)
+    if pool is not None:
+        pool.shutdown()
 
-        print(f"  Saved to: {output_path}\n")
+    manifest.save()
+    if skipped:
+        print(f"Skipped {len(skipped)} unchanged chapters: {', '.join(skipped)}")
 
     doc.close()
+    if cache is not None:
+        print(f"Page cache: {cache.hits} hits, {cache.misses} misses ({cache.directory})")
+
+    if index_path:
+        stats = update_index(Path(OUTPUT_DIR), Path(index_path))
+        print(f"Search index: {stats['indexed']} chapters indexed, {stats['unchanged']} unchanged, "
+              f"{stats['removed']} removed ({index_path})")
+
+    if export_data:
+        result = export_rulebook_data(Path(OUTPUT_DIR))
+        counts = ", ".join(f"{count} {name}" for name, count in result["counts"].items())
+        print(f"Structured data: {counts} ({result['path']})")
+        if result["untyped"]:
+            print(f"  {len(result['untyped'])} cells could not be typed; "
+                  f"run scripts/rulebook_data.py to list them")
     print("Done!")
 
 if __name__ == "__main__":
-    parse_pdf()
+    args = parse_args()
+    if args.memory_report:
+        pipeline_memory.start_report()
+    parse_pdf(None if args.no_cache else args.cache_dir, args.jobs, args.force,
+              None if args.no_index else args.index, not args.no_data, args.extractor, args.low_memory,
+              not args.no_ocr, args.ocr_jobs)
+    if args.memory_report:
+        print(pipeline_memory.finish_report())
@@ -0,0 +1,144 @@
+"""
+Polyphase windowed-sinc resampling for transcribe_with_whisper.py.
+
+The prototype low-pass filter is a Kaiser-windowed sinc with its cutoff just
+below the lower of the two Nyquist frequencies, so downsampling 44.1/48 kHz
+table recordings to 16 kHz does not fold the upper band back into speech.
+Filter banks are built once per `(source_rate, target_rate)` pair and cached.
+
+`PolyphaseResampler` is stateful: feed it chunks with `process()` and call
+`flush()` at the end of the stream, and the concatenated output equals a single
+whole-array `resample()` call. Each output phase is computed as one
+matrix-vector product over a strided view of the input, so no per-sample
+index arrays are materialized; integer decimation (48k -> 16k is 3:1) collapses
+to a single product.
+"""
+
+from __future__ import annotations
+
+import math
+from functools import lru_cache
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+ZERO_CROSSINGS = 8
+ROLLOFF = 0.9
+KAISER_BETA = 7.0
+# Input samples handled per internal step; bounds the temporaries of a large process() call.
+BLOCK_SIZE = 1 << 16
+
+
+@lru_cache(maxsize=None)
+def filter_bank(source_rate: int, target_rate: int) -> tuple[int, int, np.ndarray]:
+    """Return `(up, down, bank)` where `bank[p]` holds the time-reversed taps of phase `p`."""
+    divisor = math.gcd(source_rate, target_rate)
+    up = target_rate // divisor
+    down = source_rate // divisor
+
+    taps_per_phase = 2 * ZERO_CROSSINGS * max(1, math.ceil(down / up))
+    length = taps_per_phase * up
+    cutoff = ROLLOFF * 0.5 / max(up, down)
+
+    offsets = np.arange(length, dtype=np.float64) - length / 2
+    window = np.i0(KAISER_BETA * np.sqrt(np.clip(1.0 - (offsets / (length / 2)) ** 2, 0.0, None)))
+    prototype = 2.0 * cutoff * np.sinc(2.0 * cutoff * offsets) * window / np.i0(KAISER_BETA)
+    prototype *= up
+
+    bank = prototype.reshape(taps_per_phase, up).T[:, ::-1]
+    bank = np.ascontiguousarray(bank, dtype=np.float32)
+    bank.setflags(write=False)
+    return up, down, bank
+
+
+class PolyphaseResampler:
+    def __init__(self, source_rate: int, target_rate: int) -> None:
+        self.up, self.down, self.bank = filter_bank(source_rate, target_rate)
+        self.taps = self.bank.shape[1]
+        self.center = self.taps * self.up // 2
+
+        # The buffer starts with `taps` implicit zeros before the first sample.
+        self._buffer = np.zeros(self.taps, dtype=np.float32)
+        self._base = -self.taps
+        self._next_output = 0
+        self._input_count = 0
+        self._flushed = False
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        if self._flushed:
+            raise ValueError("PolyphaseResampler cannot process audio after flush()")
+
+        chunk = np.asarray(chunk, dtype=np.float32)
+        if chunk.size <= BLOCK_SIZE:
+            return self._process_block(chunk)
+
+        output = np.empty(self._expected_outputs(chunk.size), dtype=np.float32)
+        filled = 0
+        for start in range(0, chunk.size, BLOCK_SIZE):
+            block_output = self._process_block(chunk[start : start + BLOCK_SIZE])
+            output[filled : filled + block_output.size] = block_output
+            filled += block_output.size
+        return output[:filled]
+
+    def flush(self) -> np.ndarray:
+        if self._flushed:
+            return np.empty(0, dtype=np.float32)
+
+        self._flushed = True
+        total_outputs = output_length(self._input_count, self.up, self.down)
+        self._buffer = np.concatenate((self._buffer, np.zeros(self.taps, dtype=np.float32)))
+        return self._emit(total_outputs)
+
+    def resample(self, audio: np.ndarray) -> np.ndarray:
+        head = self.process(audio)
+        tail = self.flush()
+        return np.concatenate((head, tail)) if tail.size else head
+
+    def _process_block(self, block: np.ndarray) -> np.ndarray:
+        self._input_count += block.size
+        self._buffer = np.concatenate((self._buffer, block))
+        available_end = self._base + self._buffer.size
+        last_output = (available_end * self.up - 1 - self.center) // self.down
+        return self._emit(last_output + 1)
+
+    def _expected_outputs(self, extra_input: int) -> int:
+        available_end = self._base + self._buffer.size + extra_input
+        return max(0, (available_end * self.up - 1 - self.center) // self.down + 1 - self._next_output)
+
+    def _emit(self, stop: int) -> np.ndarray:
+        start = self._next_output
+        if stop <= start:
+            return np.empty(0, dtype=np.float32)
+
+        windows = sliding_window_view(self._buffer, self.taps)
+        output = np.empty(stop - start, dtype=np.float32)
+
+        # Outputs whose index differs by `up` share a phase and sit exactly
+        # `down` input samples apart, so each phase is one strided product.
+        for offset in range(min(self.up, stop - start)):
+            position = (start + offset) * self.down + self.center
+            first_window = position // self.up - self.taps + 1 - self._base
+            phase = position % self.up
+            count = (stop - start - offset + self.up - 1) // self.up
+            rows = windows[first_window : first_window + (count - 1) * self.down + 1 : self.down]
+            output[offset :: self.up] = rows @ self.bank[phase]
+
+        self._next_output = stop
+        keep_from = (stop * self.down + self.center) // self.up - self.taps + 1 - self._base
+        keep_from = max(0, min(keep_from, self._buffer.size))
+        self._buffer = self._buffer[keep_from:].copy()
+        self._base += keep_from
+        return output
+
+
+def output_length(input_count: int, up: int, down: int) -> int:
+    if input_count == 0:
+        return 0
+    return max(1, int(round(input_count * up / down)))
+
+
+def resample(audio: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    if source_rate == target_rate:
+        return np.asarray(audio, dtype=np.float32)
+    return PolyphaseResampler(source_rate, target_rate).resample(audio)
@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the audio preprocessing in transcribe_with_whisper.py.
+
+Runs locally on synthetic audio; no Whisper model is needed.
+
+    python scripts/bench_audio.py resample --seconds 60 600
+    python scripts/bench_audio.py decode --seconds 60 600
+    python scripts/bench_audio.py suite --update-baseline
+    python scripts/bench_audio.py suite --long
+    python scripts/bench_audio.py suite --durations 5 600 3600 10800
+
+`suite` sweeps sample width (8/16/24/32-bit), channel layout (mono, stereo,
+5.1) and sample rate (8k/16k/22.05k/44.1k/48k) at a fixed length, then sweeps
+the recording length for the default format; --long adds an hour of mono
+8 kHz. For the decode, resample and end-to-end read_wav_audio stages it
+records throughput, peak traced memory and scratch memory: how far that peak
+went past the output, i.e. the temporaries a stage allocates and frees along
+the way. Results are compared with a JSON baseline, and the run fails when a
+stage regresses beyond the threshold.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+from collections.abc import Callable
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from audio_resample import PolyphaseResampler, filter_bank  # noqa: E402
+from transcribe_with_whisper import (  # noqa: E402
+    DECODE_BLOCK_FRAMES,
+    TARGET_SAMPLE_RATE,
+    decode_frames_into,
+    map_pcm_frames,
+    read_wav_audio,
+    read_wav_layout,
+)
+
+
+SOURCE_RATES = (8_000, 22_050, 44_100, 48_000)
+ALIAS_PROBE_HZ = 10_000
+CHUNK_SECONDS = 1.0
+# (sample rate, channels, sample width in bytes)
+DECODE_FORMATS = ((16_000, 1, 2), (44_100, 2, 2), (48_000, 2, 3))
+SUITE_DEFAULT_FORMAT = (44_100, 2, 2)
+SUITE_SAMPLE_WIDTHS = (1, 2, 3, 4)
+SUITE_CHANNEL_COUNTS = (1, 2, 6)
+SUITE_SAMPLE_RATES = (8_000, 16_000, 22_050, 44_100, 48_000)
+# (sample rate, channels, sample width in bytes, seconds) added by --long
+SUITE_LONG_CASES = ((8_000, 1, 2, 3600.0),)
+DEFAULT_BASELINE = Path(__file__).resolve().parent.parent / ".bench" / "audio-baseline.json"
+MIN_STAGE_SECONDS = 0.5
+MAX_SUITE_REPEAT = 200
+# Peak-memory growth below this is noise on short cases, whatever the percentage.
+PEAK_SLACK_MIB = 1.0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    resample_parser = commands.add_parser(
+        "resample", help="compare the polyphase resampler with the old np.interp resampler"
+    )
+    resample_parser.add_argument("--seconds", type=float, nargs="+", default=[10.0, 60.0, 600.0])
+    resample_parser.add_argument("--rates", type=int, nargs="+", default=list(SOURCE_RATES))
+    resample_parser.add_argument("--repeat", type=int, default=3)
+    resample_parser.add_argument("--json", type=Path, help="also write the results to this file")
+
+    decode_parser = commands.add_parser(
+        "decode", help="compare the memory-mapped WAV decode with the old wave/readframes decode"
+    )
+    decode_parser.add_argument("--seconds", type=float, nargs="+", default=[60.0, 600.0])
+    decode_parser.add_argument("--repeat", type=int, default=3)
+    decode_parser.add_argument("--json", type=Path, help="also write the results to this file")
+
+    suite_parser = commands.add_parser(
+        "suite", help="run the preprocessing benchmark matrix and compare it with a baseline"
+    )
+    suite_parser.add_argument(
+        "--sweep-seconds",
+        type=float,
+        default=60.0,
+        help="recording length for the format sweeps (default: %(default)s)",
+    )
+    suite_parser.add_argument(
+        "--durations",
+        type=float,
+        nargs="+",
+        default=[5.0, 60.0, 600.0],
+        help="recording lengths for the default-format duration sweep",
+    )
+    suite_parser.add_argument(
+        "--long",
+        action="store_true",
+        help="add an hour-long case (3600 s of mono 8 kHz)",
+    )
+    suite_parser.add_argument("--repeat", type=int, default=3)
+    suite_parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    suite_parser.add_argument(
+        "--update-baseline", action="store_true", help="write the results as the new baseline"
+    )
+    suite_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="allowed relative throughput drop, or growth in peak or scratch memory"
+        " (default: %(default)s)",
+    )
+    suite_parser.add_argument("--json", type=Path, help="also write the results to this file")
+
+    return parser.parse_args()
+
+
+def legacy_read_wav_audio(path: Path) -> np.ndarray:
+    """The readframes + astype decode transcribe_with_whisper.py used before memory mapping."""
+    with wave.open(str(path), "rb") as wav_file:
+        sample_width = wav_file.getsampwidth()
+        sample_rate = wav_file.getframerate()
+        channel_count = wav_file.getnchannels()
+        pcm_bytes = wav_file.readframes(wav_file.getnframes())
+
+    dtype = {1: np.uint8, 2: np.int16, 4: np.int32}[sample_width]
+    audio = np.frombuffer(pcm_bytes, dtype=dtype)
+    if channel_count > 1:
+        audio = audio.reshape(-1, channel_count).mean(axis=1)
+
+    if sample_width == 1:
+        audio = (audio.astype(np.float32) - 128.0) / 128.0
+    else:
+        audio = audio.astype(np.float32) / float(2 ** (sample_width * 8 - 1))
+
+    if sample_rate != TARGET_SAMPLE_RATE:
+        audio = legacy_resample_audio(audio, sample_rate, TARGET_SAMPLE_RATE)
+    return audio.astype(np.float32)
+
+
+def legacy_resample_audio(audio: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """The linear-interpolation resampler transcribe_with_whisper.py used before polyphase."""
+    if audio.size == 0:
+        return audio.astype(np.float32)
+
+    duration_seconds = audio.size / float(source_rate)
+    target_size = max(1, int(round(duration_seconds * target_rate)))
+    source_positions = np.linspace(0.0, duration_seconds, num=audio.size, endpoint=False)
+    target_positions = np.linspace(0.0, duration_seconds, num=target_size, endpoint=False)
+    return np.interp(target_positions, source_positions, audio).astype(np.float32)
+
+
+def polyphase_whole(audio: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    return PolyphaseResampler(source_rate, target_rate).resample(audio)
+
+
+def polyphase_chunked(audio: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    resampler = PolyphaseResampler(source_rate, target_rate)
+    chunk = int(source_rate * CHUNK_SECONDS)
+    parts = [resampler.process(audio[start : start + chunk]) for start in range(0, audio.size, chunk)]
+    parts.append(resampler.flush())
+    return np.concatenate(parts)
+
+
+RESAMPLERS: dict[str, Callable[[np.ndarray, int, int], np.ndarray]] = {
+    "interp": legacy_resample_audio,
+    "polyphase": polyphase_whole,
+    "polyphase-chunked": polyphase_chunked,
+}
+
+
+def synthetic_audio(seconds: float, sample_rate: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    times = np.arange(int(seconds * sample_rate), dtype=np.float32) / sample_rate
+    audio = 0.4 * np.sin(2 * np.pi * 220.0 * times) + 0.2 * np.sin(2 * np.pi * 1_800.0 * times)
+    audio += 0.05 * rng.standard_normal(times.size)
+    return audio.astype(np.float32)
+
+
+def measure(function: Callable[[], object], repeat: int) -> tuple[float, int, object]:
+    """Return the best time, and the traced peak and result of one more call."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        result = function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return best, peak, result
+
+
+def alias_level_db(resampler: Callable[[np.ndarray, int, int], np.ndarray], source_rate: int) -> float:
+    """RMS, relative to the input, of a tone above the 8 kHz output Nyquist after resampling."""
+    if ALIAS_PROBE_HZ * 2 >= source_rate:
+        return float("nan")
+
+    times = np.arange(source_rate, dtype=np.float64) / source_rate
+    tone = np.sin(2 * np.pi * ALIAS_PROBE_HZ * times).astype(np.float32)
+    resampled = resampler(tone, source_rate, TARGET_SAMPLE_RATE)
+    settled = resampled[TARGET_SAMPLE_RATE // 10 : -TARGET_SAMPLE_RATE // 10]
+    rms = float(np.sqrt(np.mean(settled.astype(np.float64) ** 2)))
+    return 20 * np.log10(max(rms, 1e-12) / np.sqrt(0.5))
+
+
+def bench_resample(args: argparse.Namespace) -> list[dict]:
+    results = []
+    for source_rate in args.rates:
+        filter_bank(source_rate, TARGET_SAMPLE_RATE)  # build outside the timed region
+
+        for seconds in args.seconds:
+            audio = synthetic_audio(seconds, source_rate)
+            for name, resampler in RESAMPLERS.items():
+                elapsed, peak, _ = measure(
+                    lambda: resampler(audio, source_rate, TARGET_SAMPLE_RATE), args.repeat
+                )
+                results.append(
+                    {
+                        "resampler": name,
+                        "sourceRate": source_rate,
+                        "seconds": seconds,
+                        "realtimeX": seconds / elapsed,
+                        "peakMiB": peak / (1024 * 1024),
+                        "aliasDb": alias_level_db(resampler, source_rate),
+                    }
+                )
+                print_result(results[-1])
+
+    return results
+
+
+def write_synthetic_wav(
+    path: Path, seconds: float, sample_rate: int, channel_count: int, sample_width: int
+) -> None:
+    """Write a synthetic PCM WAV in one-second blocks so hour-long files stay cheap."""
+    max_magnitude = 2 ** (sample_width * 8 - 1) - 1
+    total_frames = int(seconds * sample_rate)
+
+    with wave.open(str(path), "wb") as wav_file:
+        wav_file.setnchannels(channel_count)
+        wav_file.setsampwidth(sample_width)
+        wav_file.setframerate(sample_rate)
+
+        for block_index, start in enumerate(range(0, total_frames, sample_rate)):
+            frames = min(sample_rate, total_frames - start)
+            block = synthetic_audio(frames / sample_rate, sample_rate, seed=block_index)
+            samples = np.repeat(block[:, None], channel_count, axis=1)
+            scaled = np.clip(samples * max_magnitude, -max_magnitude, max_magnitude)
+            if sample_width == 1:
+                pcm = (scaled + 128).astype(np.uint8).tobytes()
+            elif sample_width == 3:
+                wide = scaled.astype("<i4").reshape(-1, 1).view(np.uint8)
+                pcm = wide[:, :3].tobytes()
+            else:
+                pcm = scaled.astype(f"<i{sample_width}").tobytes()
+            wav_file.writeframes(pcm)
+
+
+DECODERS: dict[str, Callable[[Path], np.ndarray]] = {
+    "readframes": legacy_read_wav_audio,
+    "memmap": read_wav_audio,
+}
+
+
+def bench_decode(args: argparse.Namespace) -> list[dict]:
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench-audio-") as temp_dir:
+        for sample_rate, channel_count, sample_width in DECODE_FORMATS:
+            for seconds in args.seconds:
+                path = Path(temp_dir) / f"{sample_rate}-{channel_count}ch-{sample_width * 8}bit.wav"
+                write_synthetic_wav(path, seconds, sample_rate, channel_count, sample_width)
+
+                for name, decoder in DECODERS.items():
+                    if name == "readframes" and sample_width == 3:
+                        continue  # the old decoder rejected 24-bit PCM
+
+                    elapsed, peak, _ = measure(lambda: decoder(path), args.repeat)
+                    result = {
+                        "decoder": name,
+                        "format": f"{sample_rate} Hz {channel_count}ch {sample_width * 8}-bit",
+                        "seconds": seconds,
+                        "realtimeX": seconds / elapsed,
+                        "peakMiB": peak / (1024 * 1024),
+                        "outputMiB": seconds * TARGET_SAMPLE_RATE * 4 / (1024 * 1024),
+                    }
+                    results.append(result)
+                    print(
+                        f"{name:>10}  {result['format']:>22}  {seconds:>7.0f} s"
+                        f"  {result['realtimeX']:>9.0f}x realtime  {result['peakMiB']:>8.1f} MiB peak"
+                        f"  (output {result['outputMiB']:.1f} MiB)",
+                        flush=True,
+                    )
+
+                path.unlink()
+
+    return results
+
+
+def suite_formats(args: argparse.Namespace) -> list[tuple[int, int, int, float]]:
+    default_rate, default_channels, default_width = SUITE_DEFAULT_FORMAT
+    formats = [(default_rate, default_channels, width) for width in SUITE_SAMPLE_WIDTHS]
+    formats += [(default_rate, channels, default_width) for channels in SUITE_CHANNEL_COUNTS]
+    formats += [(rate, default_channels, default_width) for rate in SUITE_SAMPLE_RATES]
+
+    cases = []
+    for audio_format in dict.fromkeys(formats):
+        cases.append((*audio_format, args.sweep_seconds))
+    for seconds in args.durations:
+        if seconds != args.sweep_seconds:
+            cases.append((*SUITE_DEFAULT_FORMAT, seconds))
+    if args.long:
+        cases += [case for case in SUITE_LONG_CASES if case not in cases]
+    return cases
+
+
+def suite_stages(path: Path) -> dict[str, Callable[[], np.ndarray]]:
+    layout = read_wav_layout(path)
+
+    def decode() -> np.ndarray:
+        frames = map_pcm_frames(path, layout)
+        audio = np.empty(layout.frame_count, dtype=np.float32)
+        for start in range(0, layout.frame_count, DECODE_BLOCK_FRAMES):
+            block = frames[start : start + DECODE_BLOCK_FRAMES]
+            decode_frames_into(block, layout.sample_width, audio[start : start + block.shape[0]])
+        return audio
+
+    stages = {"decode": decode}
+    if layout.sample_rate != TARGET_SAMPLE_RATE:
+        decoded = decode()
+        stages["resample"] = lambda: PolyphaseResampler(
+            layout.sample_rate, TARGET_SAMPLE_RATE
+        ).resample(decoded)
+    stages["readWavAudio"] = lambda: read_wav_audio(path)
+    return stages
+
+
+def measure_stage(stage: Callable[[], np.ndarray], repeat: int) -> tuple[float, int, int]:
+    started = time.perf_counter()
+    stage()  # warm-up
+    warm_up = time.perf_counter() - started
+
+    # Millisecond-long stages are repeated until they fill the time budget, so
+    # their best-of timing is as stable as that of the long cases.
+    repeat = max(repeat, min(MAX_SUITE_REPEAT, int(MIN_STAGE_SECONDS / max(warm_up, 1e-6))))
+    elapsed, peak, output = measure(stage, repeat)
+    # Python has no count of allocation events; what the temporaries took
+    # at the peak, beyond the output that outlives the stage, stands in for it
+    return elapsed, peak, max(0, peak - output.nbytes)
+
+
+def bench_suite(args: argparse.Namespace) -> list[dict]:
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench-audio-") as temp_dir:
+        for sample_rate, channel_count, sample_width, seconds in suite_formats(args):
+            case = f"{sample_rate}Hz-{channel_count}ch-{sample_width * 8}bit-{seconds:g}s"
+            path = Path(temp_dir) / f"{case}.wav"
+            write_synthetic_wav(path, seconds, sample_rate, channel_count, sample_width)
+            # Hour-long cases are slow enough that one timed run is representative.
+            repeat = args.repeat if seconds <= 600 else 1
+
+            for stage_name, stage in suite_stages(path).items():
+                elapsed, peak, scratch = measure_stage(stage, repeat)
+                result = {
+                    "key": f"{case}/{stage_name}",
+                    "realtimeX": round(seconds / elapsed, 1),
+                    "peakMiB": round(peak / (1024 * 1024), 2),
+                    "scratchMiB": round(scratch / (1024 * 1024), 2),
+                }
+                results.append(result)
+                print(
+                    f"{result['key']:>42}  {result['realtimeX']:>10.0f}x realtime"
+                    f"  {result['peakMiB']:>9.1f} MiB peak  {result['scratchMiB']:>9.1f} MiB scratch",
+                    flush=True,
+                )
+
+            path.unlink()
+
+    return results
+
+
+def compare_with_baseline(results: list[dict], baseline: dict, threshold: float) -> list[str]:
+    previous = {result["key"]: result for result in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        before = previous.get(result["key"])
+        if before is None:
+            continue
+
+        if result["realtimeX"] < before["realtimeX"] * (1 - threshold):
+            regressions.append(
+                f"{result['key']}: throughput {before['realtimeX']:.0f}x -> {result['realtimeX']:.0f}x"
+            )
+        if result["peakMiB"] > before["peakMiB"] * (1 + threshold) + PEAK_SLACK_MIB:
+            regressions.append(
+                f"{result['key']}: peak memory {before['peakMiB']:.1f} -> {result['peakMiB']:.1f} MiB"
+            )
+        # Baselines written before scratch memory was recorded lack the field
+        if "scratchMiB" in before and (
+            result["scratchMiB"] > before["scratchMiB"] * (1 + threshold) + PEAK_SLACK_MIB
+        ):
+            regressions.append(
+                f"{result['key']}: scratch memory {before['scratchMiB']:.1f} -> {result['scratchMiB']:.1f} MiB"
+            )
+    return regressions
+
+
+def run_suite(args: argparse.Namespace) -> tuple[list[dict], int]:
+    results = bench_suite(args)
+
+    if args.update_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        baseline = {
+            "machine": {
+                "platform": platform.platform(),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+            },
+            "results": results,
+        }
+        args.baseline.write_text(json.dumps(baseline, indent=2) + "\n", encoding="utf-8")
+        print(f"Wrote baseline to {args.baseline}")
+        return results, 0
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --update-baseline first", file=sys.stderr)
+        return results, 0
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    regressions = compare_with_baseline(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return results, 1 if regressions else 0
+
+
+def print_result(result: dict) -> None:
+    print(
+        f"{result['resampler']:>18}  {result['sourceRate']:>6} Hz  {result['seconds']:>7.0f} s"
+        f"  {result['realtimeX']:>9.0f}x realtime  {result['peakMiB']:>8.1f} MiB peak"
+        f"  alias {result['aliasDb']:>7.1f} dB",
+        flush=True,
+    )
+
+
+def main() -> int:
+    args = parse_args()
+
+    status = 0
+    match args.command:
+        case "resample":
+            results = bench_resample(args)
+        case "decode":
+            results = bench_decode(args)
+        case "suite":
+            results, status = run_suite(args)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    return status
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
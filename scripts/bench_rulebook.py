@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Time the rulebook PDF parsers and check that their output does not change.
+
+`jobs` runs parse_rulebook.py and scripts/split_rulebook.py once per `--jobs`
+value, each in a scratch directory holding a copy of the PDF (with no page
+cache, OCR, search index or data export), and reports the wall time and
+speedup against the single-process run. The markdown written by every run
+must be byte-identical to the single-process output; the benchmark exits with
+status 1 otherwise.
+
+`synthetic` needs no copy of the rulebook. It generates PDFs of the given
+sizes with PyMuPDF (a Cyrillic TOC page on page 7, all-caps headers, bullets
+and ruled tables) and runs each parser on them, one process per run, with
+pipeline_memory's stage report: pages per second for the TOC, text, tables,
+formatting and write stages, and peak RSS, each the best of --repeat runs.
+The first run writes the results to a baseline file
+(.bench/synthetic-baseline.json unless --baseline says otherwise); later runs compare against it and exit with status 1 when a stage
+got slower or the peak grew by more than the tolerance. Baselines only compare
+on the machine that recorded them; --update-baseline records a new one.
+split_rulebook.py's sections are fixed to the real book's pages, so it reads
+at most the first 132 pages of a synthetic PDF.
+
+    python scripts/bench_rulebook.py jobs --jobs 1 2 4 8
+    python scripts/bench_rulebook.py jobs --pdf path/to/rulebook.pdf --parsers split
+    python scripts/bench_rulebook.py synthetic --pages 10 100 500 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+import parse_rulebook  # noqa: E402
+import pipeline_memory  # noqa: E402
+import split_rulebook  # noqa: E402
+
+DEFAULT_PDF = REPO_ROOT / "rulebook" / "Hellenvald Core Rulebook.pdf"
+# parser name -> (script, PDF location and output directory relative to the working directory)
+PARSERS = {
+    "parse": (REPO_ROOT / "parse_rulebook.py", "rulebook/Hellenvald Core Rulebook.pdf", "rulebook"),
+    "split": (REPO_ROOT / "scripts" / "split_rulebook.py", "Hellenvald Core Rulebook.pdf", "output/rulebook"),
+}
+
+DEFAULT_BASELINE = REPO_ROOT / ".bench" / "synthetic-baseline.json"
+MIN_SYNTHETIC_PAGES = 10
+# Stages faster than this are too noisy to compare against the baseline
+MIN_COMPARED_SECONDS = 0.25
+# The real rulebook's chapters and their book pages, spread over a synthetic
+# PDF's pages in proportion
+SYNTHETIC_TOC = [
+    ("Введение", 2), ("Создание персонажа", 6), ("Боец", 11), ("Специалист", 13), ("Мистик", 15),
+    ("Навыки", 18), ("Особые черты", 21), ("Снаряжение", 31), ("Столкновения", 42), ("Приключения", 51),
+    ("Таинства", 77), ("Существа", 110),
+]
+BOOK_PAGES = 125
+SYNTHETIC_HEADERS = ["ОРУЖИЕ", "ЗАЩИТА И БРОНЯ", "МАГИЯ (ОБЩЕЕ)", "ПРАВИЛА БОЯ", "СУЩЕСТВА И ИХ ЛОГОВА"]
+SYNTHETIC_WORDS = "меч щит доспех гоблин атака урон броня магия заклинание лук стрела путь герой".split()
+SYNTHETIC_COLUMNS = ["Оружие", "Размер", "Цена", "Тип", "Урон"]
+# Every this many pages carries a ruled table
+TABLE_EVERY = 5
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    jobs_parser = commands.add_parser("jobs", help="compare parser wall time across --jobs values")
+    jobs_parser.add_argument("--pdf", type=Path, default=DEFAULT_PDF)
+    jobs_parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4])
+    jobs_parser.add_argument("--parsers", nargs="+", choices=sorted(PARSERS), default=sorted(PARSERS))
+    jobs_parser.add_argument("--json", type=Path, help="also write the results to this file")
+
+    synthetic_parser = commands.add_parser(
+        "synthetic", help="per-stage throughput and peak RSS on generated PDFs, against a baseline"
+    )
+    synthetic_parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 500, 2000])
+    synthetic_parser.add_argument("--parsers", nargs="+", choices=sorted(PARSERS), default=sorted(PARSERS))
+    synthetic_parser.add_argument("--seed", type=int, default=17)
+    synthetic_parser.add_argument("--repeat", type=int, default=3,
+                                  help="runs per parser and size; each stage keeps its best (default: %(default)s)")
+    synthetic_parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    synthetic_parser.add_argument("--update-baseline", action="store_true",
+                                  help="record this run as the baseline instead of comparing")
+    synthetic_parser.add_argument("--tolerance", type=float, default=0.25,
+                                  help="allowed drop in a stage's pages per second (default: %(default)s)")
+    synthetic_parser.add_argument("--rss-tolerance", type=float, default=0.15,
+                                  help="allowed growth of peak RSS (default: %(default)s)")
+    synthetic_parser.add_argument("--json", type=Path, help="also write the results to this file")
+
+    measure_parser = commands.add_parser(
+        "measure", help="(used by synthetic) run one parser in a prepared directory, print its stages as JSON"
+    )
+    measure_parser.add_argument("parser", choices=sorted(PARSERS))
+    measure_parser.add_argument("work_dir", type=Path)
+
+    args = parser.parse_args()
+    if args.command == "synthetic" and min(args.pages) < MIN_SYNTHETIC_PAGES:
+        parser.error(f"--pages must be at least {MIN_SYNTHETIC_PAGES}")
+    if args.command == "synthetic" and args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    return args
+
+
+def prepare_work_dir(parser_name: str, pdf_path: Path, work_dir: Path) -> None:
+    """Empty work_dir and put the PDF where the parser looks for it"""
+    _, pdf_location, _ = PARSERS[parser_name]
+    shutil.rmtree(work_dir, ignore_errors=True)
+    (work_dir / pdf_location).parent.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(pdf_path, work_dir / pdf_location)
+
+
+def run_parser(
+    parser_name: str, pdf_path: Path, work_dir: Path, extra_args: list[str]
+) -> tuple[float, dict[str, bytes]]:
+    script, _, output_dir = PARSERS[parser_name]
+    prepare_work_dir(parser_name, pdf_path, work_dir)
+
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, str(script), *extra_args],
+        cwd=work_dir,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    elapsed = time.perf_counter() - started
+
+    outputs = {path.name: path.read_bytes() for path in sorted((work_dir / output_dir).glob("*.md"))}
+    return elapsed, outputs
+
+
+def bench_jobs(args: argparse.Namespace) -> tuple[list[dict], int]:
+    if not args.pdf.exists():
+        raise FileNotFoundError(f"PDF not found: {args.pdf}")
+
+    results = []
+    mismatches = 0
+    with tempfile.TemporaryDirectory(prefix="bench-rulebook-") as temp_dir:
+        for parser_name in args.parsers:
+            # Measure extraction only, and leave the repo's cache, index and data alone
+            extra = ["--no-ocr"]
+            if parser_name == "parse":
+                extra += ["--no-cache", "--no-index", "--no-data"]
+            baseline_elapsed, baseline = run_parser(
+                parser_name, args.pdf, Path(temp_dir) / "run", [*extra, "--jobs", "1"]
+            )
+
+            for jobs in args.jobs:
+                if jobs == 1:
+                    elapsed, outputs = baseline_elapsed, baseline
+                else:
+                    elapsed, outputs = run_parser(
+                        parser_name, args.pdf, Path(temp_dir) / "run", [*extra, "--jobs", str(jobs)]
+                    )
+
+                identical = outputs == baseline
+                mismatches += not identical
+                result = {
+                    "parser": parser_name,
+                    "jobs": jobs,
+                    "seconds": round(elapsed, 3),
+                    "speedup": round(baseline_elapsed / elapsed, 2),
+                    "identical": identical,
+                }
+                results.append(result)
+                print(
+                    f"{parser_name:>6}  jobs={jobs:<3} {elapsed:>7.2f}s  {result['speedup']:>5.2f}x"
+                    f"  {'identical' if identical else 'OUTPUT DIFFERS'}"
+                )
+
+    return results, 1 if mismatches else 0
+
+
+def write_line(writer: fitz.TextWriter, y: float, text: str, font: fitz.Font, size: float = 10,
+               x: float = 50) -> float:
+    """Write one line of text and return the baseline of the next"""
+    writer.append((x, y), text, font=font, fontsize=size)
+    return y + size + 4
+
+
+def write_ruled_table(page, writer: fitz.TextWriter, y: float, font: fitz.Font, rng: random.Random) -> float:
+    columns = [50, 180, 260, 340, 420, 520]
+    row_height = 18
+    rows = rng.randint(3, 8)
+    shape = page.new_shape()
+    for row in range(rows + 1):
+        shape.draw_line((columns[0], y + row * row_height), (columns[-1], y + row * row_height))
+    for x in columns:
+        shape.draw_line((x, y), (x, y + rows * row_height))
+    shape.finish(width=0.5)
+    shape.commit()
+
+    for row in range(rows):
+        cells = SYNTHETIC_COLUMNS if row == 0 else [
+            rng.choice(SYNTHETIC_WORDS),
+            rng.choice(["Малый", "Средний", "Большой"]),
+            f"{rng.randint(1, 50)} см",
+            rng.choice(["Д", "К", "Р"]),
+            f"1d{rng.choice([4, 6, 8, 10])}",
+        ]
+        for x, cell in zip(columns, cells):
+            writer.append((x + 3, y + row * row_height + 13), cell, font=font, fontsize=9)
+    return y + rows * row_height + 20
+
+
+def write_synthetic_pdf(path: Path, page_count: int, seed: int) -> None:
+    """A rulebook-shaped PDF: TOC on the parsers' TOC page, then chapters of
+    headers, paragraphs, bullets and ruled tables"""
+    rng = random.Random(seed)
+    regular, bold = fitz.Font("helv"), fitz.Font("hebo")
+    # Book page p is PDF index p + 6 (see parse_rulebook.section_page_indices)
+    scale = (page_count - parse_rulebook.TOC_PAGE_INDEX - 1) / BOOK_PAGES
+
+    doc = fitz.open()
+    for page_idx in range(page_count):
+        page = doc.new_page(width=595, height=842)
+        writer = fitz.TextWriter(page.rect)
+        y = 60.0
+        if page_idx == parse_rulebook.TOC_PAGE_INDEX:
+            y = write_line(writer, y, "СОДЕРЖАНИЕ", bold, 14)
+            for title, book_page in SYNTHETIC_TOC:
+                start = max(1, round(book_page * scale))
+                y = write_line(writer, y, f"{title}.. {start}", regular)
+                y = write_line(writer, y, f"Подраздел {start}", regular, x=70)
+        else:
+            y = write_line(writer, y, str(page_idx + 1), regular)
+            while y < 700:
+                y = write_line(writer, y + 6, rng.choice(SYNTHETIC_HEADERS), bold, 14)
+                for _ in range(rng.randint(3, 8)):
+                    text = " ".join(rng.choice(SYNTHETIC_WORDS) for _ in range(rng.randint(6, 12)))
+                    if rng.random() < 0.25:
+                        y = write_line(writer, y, "• " + text, regular)
+                    else:
+                        y = write_line(writer, y, text.capitalize() + ".", regular)
+                if page_idx % TABLE_EVERY == 0 and y < 600:
+                    y = write_ruled_table(page, writer, y + 6, regular, rng)
+        writer.write_text(page)
+
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+
+def measure(args: argparse.Namespace) -> int:
+    """Run one parser with the stage report on and print the report as JSON"""
+    os.chdir(args.work_dir)
+    pipeline_memory.start_report(trace_allocations=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        match args.parser:
+            case "parse":
+                parse_rulebook.parse_pdf(force=True, index_path=None, export_data=False, ocr=False)
+            case "split":
+                split_rulebook.main(force=True, ocr=False)
+    print(json.dumps(pipeline_memory.stop_report().as_dict()))
+    return 0
+
+
+def best_report(reports: list[dict]) -> dict:
+    """Combine repeated stage reports, keeping each stage's fastest time and lowest peak"""
+    stages = {}
+    for report in reports:
+        for name, stage in report["stages"].items():
+            if name not in stages:
+                stages[name] = dict(stage)
+                continue
+            best = stages[name]
+            best["seconds"] = min(best["seconds"], stage["seconds"])
+            best["peakRssMb"] = min(best["peakRssMb"], stage["peakRssMb"])
+    return {"seconds": min(report["seconds"] for report in reports), "stages": stages}
+
+
+def synthetic_result(parser_name: str, page_count: int, report: dict) -> dict:
+    stages = report["stages"]
+    # Every page the parser wrote goes through formatting once
+    pages = stages.get("formatting", {}).get("entries", 0)
+    result = {
+        "parser": parser_name,
+        "pages": page_count,
+        "pagesProcessed": pages,
+        "seconds": report["seconds"],
+        "peakRssMb": max(stage["peakRssMb"] for stage in stages.values()),
+        "stages": {},
+    }
+    for name, stage in stages.items():
+        # "other" is the time outside every stage, not a stage pages go through
+        stage_pages = {"toc": 1, "other": 0}.get(name, pages)
+        result["stages"][name] = {
+            "seconds": stage["seconds"],
+            "pagesPerSecond": round(stage_pages / stage["seconds"], 1) if stage_pages and stage["seconds"] else None,
+            "peakRssMb": stage["peakRssMb"],
+        }
+    return result
+
+
+def find_regressions(results: list[dict], baseline: dict, tolerance: float, rss_tolerance: float) -> list[str]:
+    previous = {(result["parser"], result["pages"]): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get((result["parser"], result["pages"]))
+        if before is None:
+            continue
+        label = f"{result['parser']} {result['pages']} pages"
+        for name, stage in result["stages"].items():
+            old = before["stages"].get(name)
+            if not old or not old["pagesPerSecond"] or old["seconds"] < MIN_COMPARED_SECONDS:
+                continue
+            if (stage["pagesPerSecond"] or 0) < old["pagesPerSecond"] * (1 - tolerance):
+                regressions.append(
+                    f"{label}: {name} {old['pagesPerSecond']:.1f} -> {stage['pagesPerSecond']:.1f} pages/s"
+                )
+        if result["peakRssMb"] > before["peakRssMb"] * (1 + rss_tolerance):
+            regressions.append(f"{label}: peak RSS {before['peakRssMb']:.1f} -> {result['peakRssMb']:.1f} MiB")
+    return regressions
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "pymupdf": fitz.VersionBind,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def bench_synthetic(args: argparse.Namespace) -> tuple[list[dict], int]:
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench-rulebook-") as temp_dir:
+        for page_count in args.pages:
+            pdf_path = Path(temp_dir) / f"synthetic-{page_count}.pdf"
+            started = time.perf_counter()
+            write_synthetic_pdf(pdf_path, page_count, args.seed)
+            print(f"generated {page_count} pages in {time.perf_counter() - started:.2f}s"
+                  f" ({pdf_path.stat().st_size / 2**20:.1f} MiB)")
+
+            for parser_name in args.parsers:
+                work_dir = Path(temp_dir) / "run"
+                reports = []
+                for _ in range(args.repeat):
+                    prepare_work_dir(parser_name, pdf_path, work_dir)
+                    # A process per run, so each peak RSS is the run's own
+                    completed = subprocess.run(
+                        [sys.executable, str(Path(__file__).resolve()), "measure", parser_name, str(work_dir)],
+                        check=True,
+                        capture_output=True,
+                        text=True,
+                    )
+                    reports.append(json.loads(completed.stdout.splitlines()[-1]))
+                result = synthetic_result(parser_name, page_count, best_report(reports))
+                results.append(result)
+
+                print(f"{parser_name:>6}  {page_count:>5} pages  {result['pagesProcessed']:>5} processed"
+                      f"  {result['seconds']:>7.2f}s  peak {result['peakRssMb']:>6.1f} MiB")
+                for name, stage in result["stages"].items():
+                    rate = f"{stage['pagesPerSecond']:>9.1f} pages/s" if stage["pagesPerSecond"] else " " * 17
+                    print(f"        {name:<11} {rate}  {stage['seconds']:>7.3f}s  {stage['peakRssMb']:>6.1f} MiB")
+
+    if args.update_baseline or not args.baseline.exists():
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"environment": environment(), "results": results}
+        args.baseline.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+        print(f"baseline written to {args.baseline}")
+        return results, 0
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    if baseline.get("environment") != environment():
+        print(f"note: {args.baseline} was recorded on {baseline.get('environment')}, this is {environment()}")
+    regressions = find_regressions(results, baseline, args.tolerance, args.rss_tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    print(f"baseline check against {args.baseline}: "
+          + (f"{len(regressions)} regressions" if regressions else "no regressions"))
+    return results, 1 if regressions else 0
+
+
+def main() -> int:
+    args = parse_args()
+
+    match args.command:
+        case "jobs":
+            results, status = bench_jobs(args)
+        case "synthetic":
+            results, status = bench_synthetic(args)
+        case "measure":
+            return measure(args)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+Build manifest for the rulebook chapter files.
+
+For every chapter file the manifest records what it was built from: the PDF
+page range, a hash of each page's content stream and the resources it draws
+with (fonts, images, form XObjects), a hash of the generator
+source files, the extraction options (extractor version, table engine) and a
+hash of the file that was written. A chapter is up to date when all of these
+still match, including the file on disk, so a rerun only rebuilds chapters
+whose pages, page range or formatting code changed, and restores files that
+were edited or deleted by hand.
+
+The manifest lives next to the chapter files as `.build-manifest.json`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+
+
+MANIFEST_NAME = ".build-manifest.json"
+MANIFEST_VERSION = 2
+OBJECT_REFERENCE = re.compile(r"\b(\d+) 0 R\b")
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(path: str | Path) -> str | None:
+    try:
+        return sha256_bytes(Path(path).read_bytes())
+    except FileNotFoundError:
+        return None
+
+
+def page_resources(pdf_doc, page_xref: int) -> str:
+    """The source of a page's /Resources dictionary, inherited from the page tree if need be"""
+    xref = page_xref
+    while True:
+        kind, value = pdf_doc.xref_get_key(xref, "Resources")
+        if kind != "null":
+            return f"{value} 0 R" if kind == "xref" else value
+        kind, parent = pdf_doc.xref_get_key(xref, "Parent")
+        if kind != "xref":
+            return ""
+        xref = int(parent.split()[0])
+
+
+def read_object(pdf_doc, xref: int) -> tuple[bytes, list[int]]:
+    """Digest an object's definition and raw stream; also return the objects it references"""
+    source = pdf_doc.xref_object(xref, compressed=True)
+    digest = hashlib.sha256(source.encode("utf-8"))
+    if pdf_doc.xref_is_stream(xref):
+        digest.update(pdf_doc.xref_stream_raw(xref))
+    return digest.digest(), [int(ref) for ref in OBJECT_REFERENCE.findall(source)]
+
+
+def page_hashes(pdf_doc, page_indices) -> list[str]:
+    """Hash each page's decompressed content stream and every object its resources reference.
+
+    A replaced image or font leaves the content stream as it was, so the
+    objects reachable from /Resources are hashed too.
+    """
+    # Fonts and images are shared between pages; hash each object once
+    objects: dict[int, tuple[bytes, list[int]]] = {}
+    hashes = []
+    for page_idx in page_indices:
+        page = pdf_doc[page_idx]
+        resources = page_resources(pdf_doc, page.xref)
+        digest = hashlib.sha256(page.read_contents())
+        digest.update(b"\0")
+        digest.update(resources.encode("utf-8"))
+
+        seen = set()
+        pending = [int(xref) for xref in OBJECT_REFERENCE.findall(resources)]
+        while pending:
+            xref = pending.pop()
+            if xref in seen:
+                continue
+            seen.add(xref)
+            if xref not in objects:
+                objects[xref] = read_object(pdf_doc, xref)
+            object_digest, references = objects[xref]
+            digest.update(object_digest)
+            pending.extend(references)
+
+        hashes.append(digest.hexdigest())
+    return hashes
+
+
+class BuildManifest:
+    def __init__(self, output_dir: str | Path, generator_sources: list[str | Path], options: dict) -> None:
+        self.output_dir = Path(output_dir)
+        self.path = self.output_dir / MANIFEST_NAME
+        self.generator = sha256_bytes(
+            b"".join(Path(source).read_bytes() for source in generator_sources)
+        )
+        self.options = options
+        self.entries = self._load()
+
+    def _load(self) -> dict:
+        try:
+            manifest = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+            return {}
+        entries = manifest.get("files")
+        return entries if isinstance(entries, dict) else {}
+
+    def inputs(self, pdf_doc, page_indices, **details) -> dict:
+        """Describe what a chapter is built from; `details` adds chapter-specific fields."""
+        page_indices = list(page_indices)
+        return {
+            "pages": [page_indices[0], page_indices[-1]] if page_indices else [],
+            "pageHashes": page_hashes(pdf_doc, page_indices),
+            "generator": self.generator,
+            "options": self.options,
+            **details,
+        }
+
+    def is_current(self, filename: str, inputs: dict) -> bool:
+        entry = self.entries.get(filename)
+        if entry is None or entry.get("inputs") != inputs:
+            return False
+        return entry.get("output") == file_digest(self.output_dir / filename)
+
+    def record(self, filename: str, inputs: dict) -> None:
+        self.entries[filename] = {
+            "inputs": inputs,
+            "output": file_digest(self.output_dir / filename),
+        }
+
+    def save(self) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=self.output_dir, prefix=".tmp-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as temp_file:
+                json.dump({"version": MANIFEST_VERSION, "files": self.entries}, temp_file, indent=2)
+                temp_file.write("\n")
+            os.replace(temp_name, self.path)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Check that the --vad pre-pass keeps the speech of the audio fixtures.
+
+By default this needs only NumPy: for each fixture it checks that the detected
+speech regions cover the whole span between the first and last loud frame, and
+that SpeechMap maps compacted timestamps back unchanged when only the tail was
+dropped and correctly across the join of two recordings with a pause between.
+
+With --whisper each fixture is also transcribed with and without voice activity
+detection using one loaded model, and the check fails if the segment texts
+differ or a timestamp moves by more than the tolerance.
+
+    uv run --with numpy python scripts/check_vad_fixtures.py
+    uv run --with openai-whisper --with numpy python scripts/check_vad_fixtures.py --whisper
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from transcribe_with_whisper import (
+    TARGET_SAMPLE_RATE,
+    load_whisper_model,
+    read_wav_audio,
+    transcribe_audio,
+)
+from voice_activity import FRAME_MS, compact_speech, detect_speech_regions
+
+
+FIXTURES_DIR = Path(__file__).resolve().parent.parent / "fixtures" / "audio"
+DEFAULT_FIXTURES = ("non-action-think.wav", "attack-goblin.wav")
+# Frames within this many dB of the loudest one bound a fixture's speech span
+SPAN_BELOW_PEAK_DB = 40.0
+JOIN_PAUSE_SECONDS = 2
+MAP_STEP_MS = 10
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("fixtures", nargs="*", default=list(DEFAULT_FIXTURES))
+    parser.add_argument("--whisper", action="store_true", help="also compare Whisper output with and without --vad")
+    parser.add_argument("--model", default="tiny.en")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--tolerance-ms", type=int, default=250)
+    return parser.parse_args()
+
+
+def speech_span(audio: np.ndarray, sample_rate: int) -> tuple[int, int]:
+    """Samples from the first to the end of the last frame near the peak energy"""
+    frame_size = sample_rate * FRAME_MS // 1000
+    frame_count = audio.size // frame_size
+    frames = audio[: frame_count * frame_size].reshape(frame_count, frame_size)
+    energy_db = 10 * np.log10(np.mean(np.square(frames, dtype=np.float32), axis=1) + 1e-10)
+    loud = np.flatnonzero(energy_db >= energy_db.max() - SPAN_BELOW_PEAK_DB)
+    return int(loud[0]) * frame_size, (int(loud[-1]) + 1) * frame_size
+
+
+def check_regions(audio: np.ndarray) -> list[str]:
+    start, end = speech_span(audio, TARGET_SAMPLE_RATE)
+    covered = np.zeros(audio.size, dtype=bool)
+    for region_start, region_end in detect_speech_regions(audio, TARGET_SAMPLE_RATE):
+        covered[region_start:region_end] = True
+
+    missed = np.count_nonzero(~covered[start:end])
+    if missed:
+        return [f"regions miss {missed * 1000 // TARGET_SAMPLE_RATE} ms of the speech span {start}-{end}"]
+    return []
+
+
+def check_identity_map(audio: np.ndarray) -> list[str]:
+    speech = compact_speech(audio, TARGET_SAMPLE_RATE)
+    speech_map = speech.speech_map
+    if speech_map.original_starts.size != 1 or speech_map.original_starts[0] != 0:
+        return [f"expected one region from the start, got starts {speech_map.original_starts.tolist()}"]
+
+    moved = [
+        compact_ms
+        for compact_ms in range(0, speech.speech_ms, MAP_STEP_MS)
+        if speech_map.to_original_ms(compact_ms) != compact_ms
+    ]
+    if moved:
+        return [f"nothing before the tail was skipped, but {len(moved)} timestamps moved (first at {moved[0]} ms)"]
+    return []
+
+
+def check_join_map(first: np.ndarray, second: np.ndarray) -> list[str]:
+    pause = np.zeros(JOIN_PAUSE_SECONDS * TARGET_SAMPLE_RATE, dtype=first.dtype)
+    audio = np.concatenate([first, pause, second])
+    speech = compact_speech(audio, TARGET_SAMPLE_RATE)
+    speech_map = speech.speech_map
+    if speech_map.original_starts.size != 2:
+        return [f"expected the pause to split two regions, got {speech_map.original_starts.size}"]
+    if speech.skipped_ms < JOIN_PAUSE_SECONDS * 1000 // 2:
+        return [f"only {speech.skipped_ms} ms of the {JOIN_PAUSE_SECONDS} s pause was skipped"]
+
+    problems = []
+    samples_per_ms = TARGET_SAMPLE_RATE // 1000
+    for index in range(2):
+        compact_start = int(speech_map.compact_starts[index])
+        original_start = int(speech_map.original_starts[index])
+        length = int(speech_map.lengths[index])
+        for offset in range(0, length, MAP_STEP_MS * samples_per_ms):
+            compact_ms = (compact_start + offset) // samples_per_ms
+            original = speech_map.to_original_ms(compact_ms) * samples_per_ms
+            # A compacted timestamp has to point at the same audio in the original
+            compact = compact_ms * samples_per_ms
+            if original != original_start + compact - compact_start or audio[original] != speech.audio[compact]:
+                problems.append(f"region {index}: compacted {compact_ms} ms maps to {original // samples_per_ms} ms")
+                break
+
+    first_end_ms = (int(speech_map.compact_starts[0]) + int(speech_map.lengths[0])) // samples_per_ms
+    expected_end_ms = (int(speech_map.original_starts[0]) + int(speech_map.lengths[0])) // samples_per_ms
+    mapped_end_ms = speech_map.to_original_ms(first_end_ms, is_end=True)
+    if mapped_end_ms != expected_end_ms:
+        problems.append(f"end of region 0 maps to {mapped_end_ms} ms, expected {expected_end_ms} ms")
+    return problems
+
+
+def compare_segments(baseline: list[dict], with_vad: list[dict], tolerance_ms: int) -> list[str]:
+    problems = []
+    if [segment["text"] for segment in baseline] != [segment["text"] for segment in with_vad]:
+        problems.append("segment texts differ")
+        return problems
+
+    for index, (expected, actual) in enumerate(zip(baseline, with_vad)):
+        for field in ("startMs", "endMs"):
+            drift = abs(expected[field] - actual[field])
+            if drift > tolerance_ms:
+                problems.append(f"segment {index} {field} moved by {drift} ms")
+
+    return problems
+
+
+def report(status_name: str, problems: list[str], details: list[str] = ()) -> bool:
+    status = "FAIL" if problems else "ok"
+    print(f"{status:>4}  {status_name}")
+    for line in details:
+        print(f"        {line}")
+    for problem in problems:
+        print(f"        {problem}")
+    return bool(problems)
+
+
+def main() -> int:
+    args = parse_args()
+    model = load_whisper_model(args.model) if args.whisper else None
+    failures = 0
+    audios = []
+
+    for fixture in args.fixtures:
+        audio_path = Path(fixture) if Path(fixture).exists() else FIXTURES_DIR / fixture
+        audio = read_wav_audio(audio_path)
+        audios.append((audio_path.name, audio))
+
+        speech = compact_speech(audio, TARGET_SAMPLE_RATE)
+        failures += report(
+            f"{audio_path.name}  (vad kept {speech.speech_ms} of {speech.original_ms} ms)",
+            check_regions(audio) + check_identity_map(audio),
+        )
+
+        if model is not None:
+            baseline = transcribe_audio(model, audio, args.language)
+            with_vad = transcribe_audio(model, audio, args.language, vad=True)
+            failures += report(
+                f"{audio_path.name}  whisper with and without --vad",
+                compare_segments(baseline, with_vad, args.tolerance_ms),
+                [f"baseline: {segment}" for segment in baseline] + [f"vad:      {segment}" for segment in with_vad],
+            )
+
+    for (first_name, first), (second_name, second) in zip(audios, audios[1:]):
+        failures += report(
+            f"{first_name} + {JOIN_PAUSE_SECONDS} s pause + {second_name}  timestamp mapping",
+            check_join_map(first, second),
+        )
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Compare fp32 and `--quantize int8` Whisper inference on the audio fixtures.
+
+For every model, the fixture manifest is transcribed twice with
+`transcribe_with_whisper.py --batch --timings --no-cache`, once per precision,
+each in a fresh process so peak RSS and model load time are measured
+separately. The report shows the transcription speedup, the change in model
+load time and peak memory, and every fixture whose transcript differs between
+the two, with the word error rate of each against the manifest's spoken text.
+
+The first int8 run of a model quantizes and caches it; run the script twice to
+see the load time of the cached model.
+
+    uv run --with openai-whisper --with numpy python scripts/compare_quantized.py
+    python scripts/compare_quantized.py --models tiny.en base.en small.en
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+
+SCRIPT_PATH = Path(__file__).resolve().parent / "transcribe_with_whisper.py"
+MANIFEST_PATH = Path(__file__).resolve().parent.parent / "fixtures" / "audio" / "manifest.json"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--models", nargs="+", default=["tiny.en", "base.en"])
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--manifest", type=Path, default=MANIFEST_PATH)
+    parser.add_argument("--threads", type=int, help="torch threads for both runs")
+    parser.add_argument("--json", type=Path, help="also write the comparison to this file")
+    return parser.parse_args()
+
+
+def run_batch(args: argparse.Namespace, model: str, quantize: str | None) -> dict[str, dict]:
+    command = [
+        sys.executable,
+        str(SCRIPT_PATH),
+        "--batch",
+        str(args.manifest),
+        "--model",
+        model,
+        "--language",
+        args.language,
+        "--jobs",
+        "1",
+        "--no-cache",
+        "--timings",
+    ]
+    if args.threads is not None:
+        command += ["--threads-per-job", str(args.threads)]
+    if quantize is not None:
+        command += ["--quantize", quantize]
+
+    completed = subprocess.run(command, check=True, capture_output=True, text=True)
+    results = {}
+    for line in completed.stdout.splitlines():
+        result = json.loads(line)
+        if "error" in result:
+            raise RuntimeError(f"{result['audioFile']}: {result['error']}")
+        results[Path(result["audioFile"]).name] = result
+    return results
+
+
+def normalize_words(text: str) -> list[str]:
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    expected = normalize_words(reference)
+    actual = normalize_words(hypothesis)
+    if not expected:
+        return float(bool(actual))
+
+    previous = list(range(len(actual) + 1))
+    for row, expected_word in enumerate(expected, start=1):
+        current = [row]
+        for column, actual_word in enumerate(actual, start=1):
+            current.append(
+                min(
+                    previous[column] + 1,
+                    current[column - 1] + 1,
+                    previous[column - 1] + (expected_word != actual_word),
+                )
+            )
+        previous = current
+    return previous[-1] / len(expected)
+
+
+def transcript(result: dict) -> str:
+    return " ".join(segment["text"] for segment in result["segments"])
+
+
+def summarize_run(results: dict[str, dict]) -> dict:
+    timings = [result["timings"] for result in results.values()]
+    return {
+        "loadModelMs": round(sum(timing.get("loadModelMs", 0.0) for timing in timings), 1),
+        "transcribeMs": round(sum(timing.get("transcribeMs", 0.0) for timing in timings), 1),
+        "peakRssMb": max(timing.get("peakRssMb", 0.0) for timing in timings),
+    }
+
+
+def compare_model(args: argparse.Namespace, model: str, spoken: dict[str, str]) -> dict:
+    baseline = run_batch(args, model, None)
+    quantized = run_batch(args, model, "int8")
+    baseline_summary = summarize_run(baseline)
+    quantized_summary = summarize_run(quantized)
+
+    differences = []
+    for name, result in baseline.items():
+        before = transcript(result)
+        after = transcript(quantized[name])
+        if before != after:
+            differences.append(
+                {
+                    "file": name,
+                    "fp32": before,
+                    "int8": after,
+                    "fp32Wer": round(word_error_rate(spoken.get(name, ""), before), 3),
+                    "int8Wer": round(word_error_rate(spoken.get(name, ""), after), 3),
+                }
+            )
+
+    return {
+        "model": model,
+        "fp32": baseline_summary,
+        "int8": quantized_summary,
+        "speedup": round(baseline_summary["transcribeMs"] / quantized_summary["transcribeMs"], 2)
+        if quantized_summary["transcribeMs"]
+        else None,
+        "differences": differences,
+        "fixtures": len(baseline),
+    }
+
+
+def print_comparison(comparison: dict) -> None:
+    fp32 = comparison["fp32"]
+    int8 = comparison["int8"]
+    print(
+        f"{comparison['model']}: transcribe {fp32['transcribeMs']:.0f} -> {int8['transcribeMs']:.0f} ms"
+        f" ({comparison['speedup']}x), load {fp32['loadModelMs']:.0f} -> {int8['loadModelMs']:.0f} ms,"
+        f" peak RSS {fp32['peakRssMb']:.0f} -> {int8['peakRssMb']:.0f} MB,"
+        f" {len(comparison['differences'])}/{comparison['fixtures']} transcripts differ"
+    )
+    for difference in comparison["differences"]:
+        print(f"    {difference['file']}")
+        print(f"        fp32 (WER {difference['fp32Wer']:.2f}): {difference['fp32']}")
+        print(f"        int8 (WER {difference['int8Wer']:.2f}): {difference['int8']}")
+
+
+def main() -> int:
+    args = parse_args()
+    manifest = json.loads(args.manifest.read_text(encoding="utf-8"))
+    spoken = {fixture["file"]: fixture.get("spokenText", "") for fixture in manifest["fixtures"]}
+
+    comparisons = []
+    for model in args.models:
+        comparison = compare_model(args, model, spoken)
+        comparisons.append(comparison)
+        print_comparison(comparison)
+
+    if args.json:
+        args.json.write_text(json.dumps(comparisons, indent=2) + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Rolling-buffer streaming transcription for transcribe_with_whisper.py.
+
+`StreamingDecoder` receives 16 kHz mono audio in arbitrary chunks and re-runs
+the decoder over the uncommitted tail of the stream on a fixed cadence. Each
+decode yields a hypothesis: a list of segments with absolute timestamps. A
+segment is committed once two consecutive hypotheses agree on it and it is not
+the last segment of the newest one (the last segment is usually a word that is
+still being spoken). The audio before the end of the last committed segment is
+then dropped from the buffer, so every decode stays short.
+
+The uncommitted rest of the newest hypothesis is reported as a partial, which
+is what gives text before an utterance is finished. When the buffer grows past
+`max_buffer_seconds` without an agreement, everything but the last segment is
+committed anyway, and a buffer with no speech in it is trimmed so silence does
+not accumulate.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+
+import numpy as np
+
+
+STREAM_SAMPLE_RATE = 16_000
+DEFAULT_STEP_SECONDS = 0.5
+DEFAULT_MAX_BUFFER_SECONDS = 20.0
+# Start times of the "same" segment in two decodes may drift by a frame or two.
+AGREEMENT_TOLERANCE_MS = 300
+# Audio kept when a buffer without any recognized speech is trimmed.
+SILENCE_KEEP_SECONDS = 1.0
+# Committed text passed back to the decoder as context after the buffer is trimmed.
+PROMPT_CHARS = 200
+
+Decoder = Callable[[np.ndarray, str | None], list[dict]]
+
+
+def pcm16_to_mono(raw: bytes, channel_count: int) -> np.ndarray:
+    """Convert interleaved little-endian 16-bit PCM to float32 mono in [-1, 1)."""
+    samples = np.frombuffer(raw, dtype="<i2")
+    if channel_count == 1:
+        return samples.astype(np.float32) / 32768.0
+
+    frames = samples.reshape(-1, channel_count)
+    mono = np.zeros(frames.shape[0], dtype=np.float32)
+    for channel in range(channel_count):
+        np.add(mono, frames[:, channel], out=mono, casting="unsafe")
+    mono *= 1.0 / (32768.0 * channel_count)
+    return mono
+
+
+class StreamingDecoder:
+    def __init__(
+        self,
+        decode: Decoder,
+        step_seconds: float = DEFAULT_STEP_SECONDS,
+        max_buffer_seconds: float = DEFAULT_MAX_BUFFER_SECONDS,
+    ) -> None:
+        self.decode = decode
+        self.step_samples = max(1, int(step_seconds * STREAM_SAMPLE_RATE))
+        self.max_buffer_samples = int(max_buffer_seconds * STREAM_SAMPLE_RATE)
+
+        self._buffer = np.empty(0, dtype=np.float32)
+        # Absolute sample index of the first sample in the buffer.
+        self._buffer_start = 0
+        self._undecoded = 0
+        self._previous: list[dict] = []
+        self._partial_text = ""
+        self._committed_end_ms = 0
+        self._committed_text = ""
+
+    @property
+    def received_ms(self) -> int:
+        return self._to_ms(self._buffer_start + self._buffer.size)
+
+    @property
+    def due(self) -> bool:
+        """True when enough audio arrived since the last decode."""
+        return self._undecoded >= self.step_samples
+
+    def append(self, audio: np.ndarray) -> None:
+        self._buffer = np.concatenate((self._buffer, np.asarray(audio, dtype=np.float32)))
+        self._undecoded += audio.size
+
+    def step(self) -> list[dict]:
+        """Decode the buffered tail and return the resulting events."""
+        self._undecoded = 0
+        if self._buffer.size == 0:
+            return []
+
+        hypothesis = self._hypothesis()
+        agreed = self._agreed_prefix(hypothesis)
+        if len(agreed) == len(hypothesis):
+            # The newest segment may still grow; it needs a later decode to confirm it.
+            agreed = agreed[:-1]
+        if not agreed and self._buffer.size > self.max_buffer_samples:
+            agreed = hypothesis[:-1] if len(hypothesis) > 1 else hypothesis
+
+        events = self._commit(agreed)
+        pending = hypothesis[len(agreed) :]
+        self._previous = pending
+
+        if not hypothesis and self._buffer.size > self.max_buffer_samples:
+            keep = int(SILENCE_KEEP_SECONDS * STREAM_SAMPLE_RATE)
+            self._trim_to(self._buffer_start + self._buffer.size - keep)
+
+        events.extend(self._partial_event(pending))
+        return events
+
+    def finish(self) -> list[dict]:
+        """Decode whatever is left and commit all of it."""
+        events = self._commit(self._hypothesis()) if self._buffer.size else []
+        self._previous = []
+        self._partial_text = ""
+        return events
+
+    def _hypothesis(self) -> list[dict]:
+        prompt = self._committed_text[-PROMPT_CHARS:] or None
+        offset_ms = self._to_ms(self._buffer_start)
+
+        hypothesis = []
+        for segment in self.decode(self._buffer, prompt):
+            start_ms = segment["startMs"] + offset_ms
+            end_ms = min(segment["endMs"] + offset_ms, self.received_ms)
+            if (start_ms + end_ms) / 2 < self._committed_end_ms:
+                continue
+            hypothesis.append({"text": segment["text"], "startMs": start_ms, "endMs": end_ms})
+        return hypothesis
+
+    def _agreed_prefix(self, hypothesis: list[dict]) -> list[dict]:
+        agreed = []
+        for current, previous in zip(hypothesis, self._previous):
+            if current["text"] != previous["text"]:
+                break
+            if abs(current["startMs"] - previous["startMs"]) > AGREEMENT_TOLERANCE_MS:
+                break
+            agreed.append(current)
+        return agreed
+
+    def _commit(self, segments: list[dict]) -> list[dict]:
+        if not segments:
+            return []
+
+        self._committed_end_ms = segments[-1]["endMs"]
+        self._committed_text = " ".join(
+            [self._committed_text, *(segment["text"] for segment in segments)]
+        ).strip()
+        self._trim_to(self._committed_end_ms * STREAM_SAMPLE_RATE // 1000)
+        return [{"type": "segment", **segment} for segment in segments]
+
+    def _partial_event(self, pending: list[dict]) -> list[dict]:
+        text = " ".join(segment["text"] for segment in pending)
+        if text == self._partial_text:
+            return []
+
+        self._partial_text = text
+        start_ms = pending[0]["startMs"] if pending else self._committed_end_ms
+        end_ms = pending[-1]["endMs"] if pending else self._committed_end_ms
+        return [{"type": "partial", "text": text, "startMs": start_ms, "endMs": end_ms}]
+
+    def _trim_to(self, absolute_sample: int) -> None:
+        drop = min(max(0, absolute_sample - self._buffer_start), self._buffer.size)
+        if drop:
+            self._buffer = self._buffer[drop:].copy()
+            self._buffer_start += drop
+
+    @staticmethod
+    def _to_ms(sample: int) -> int:
+        return int(round(sample * 1000 / STREAM_SAMPLE_RATE))
@@ -0,0 +1,170 @@
+"""
+OCR fallback for rulebook pages without a usable text layer.
+
+Scanned pages come out of `get_text()` empty, or as glyph garbage when their
+font has no Unicode mapping (the `[OCR]` tags rulebook_markdown strips are a
+leftover of such pages). `ocr_pages` finds them: pages whose text layer has
+too few letters, but which have images to read the text from. Only those are
+rendered and run through the Tesseract CLI (Russian plus English), several
+processes at a time; every other page keeps the native text layer.
+
+Results are cached by the SHA-256 of the rendered page image and the OCR
+settings (see rulebook_cache.OcrCache), so a rerun never OCRs the same page
+twice. Tesseract has to be on PATH with its Russian data
+(`apt install tesseract-ocr tesseract-ocr-rus`, `brew install tesseract
+tesseract-lang`); without it the pages keep their native text and a warning
+lists them.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+from collections import deque
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from rulebook_cache import OcrCache
+
+
+OCR_FORMAT_VERSION = 1
+OCR_LANGUAGES = "rus+eng"
+OCR_DPI = 300
+TESSERACT = "tesseract"
+# A text layer with fewer letters than this, or where letters are not the
+# majority of the visible characters, is not usable
+MIN_LETTERS = 20
+MIN_LETTER_SHARE = 0.5
+# Rendered pages waiting for a Tesseract process, per process
+QUEUED_PER_JOB = 2
+
+
+def find_tesseract() -> str | None:
+    return shutil.which(TESSERACT)
+
+
+def letter_count(text: str) -> int:
+    return sum(char.isalpha() for char in text)
+
+
+def has_text_layer(text: str) -> bool:
+    letters = letter_count(text)
+    visible = sum(not char.isspace() for char in text)
+    return letters >= MIN_LETTERS and letters >= visible * MIN_LETTER_SHARE
+
+
+def is_scan(page, text: str | None = None) -> bool:
+    """Whether the page has images and no usable text layer; text is its get_text(), if already read"""
+    if not page.get_images():
+        return False
+    return not has_text_layer(page.get_text() if text is None else text)
+
+
+def render_page(page) -> bytes:
+    """The page as a grayscale PNG at OCR_DPI"""
+    return page.get_pixmap(dpi=OCR_DPI, colorspace=fitz.csGRAY).tobytes("png")
+
+
+def ocr_key(image: bytes) -> str:
+    digest = hashlib.sha256()
+    settings = {"format": OCR_FORMAT_VERSION, "languages": OCR_LANGUAGES, "dpi": OCR_DPI}
+    digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(image)
+    return digest.hexdigest()
+
+
+def run_tesseract(tesseract: str, image: bytes, single_threaded: bool) -> str:
+    env = None
+    if single_threaded:
+        # The pool already keeps every core busy; Tesseract's own OpenMP
+        # threads would only compete with it
+        env = {**os.environ, "OMP_THREAD_LIMIT": "1"}
+    completed = subprocess.run(
+        [tesseract, "stdin", "stdout", "-l", OCR_LANGUAGES, "--dpi", str(OCR_DPI)],
+        input=image,
+        capture_output=True,
+        check=False,
+        env=env,
+    )
+    if completed.returncode != 0:
+        stderr = completed.stderr.decode("utf-8", "replace").strip()
+        raise RuntimeError(f"tesseract exited with {completed.returncode}: {stderr}")
+    # Tesseract ends every page with a form feed
+    return completed.stdout.decode("utf-8").replace("\f", "").strip() + "\n"
+
+
+def ocr_pages(doc, page_indices: Iterable[int], cache_dir: str | Path | None = None,
+              jobs: int = 1) -> dict[int, str | None]:
+    """OCR the given pages that have no usable text layer
+
+    Returns {page_idx: text} for those pages; the text is None when Tesseract
+    is not installed. Pages that read better natively are left out.
+    """
+    cache = OcrCache(cache_dir) if cache_dir else None
+    tesseract = find_tesseract()
+    results: dict[int, str | None] = {}
+    native: dict[int, str] = {}
+    missing_tesseract = []
+    pending: deque[tuple[int, str, Future]] = deque()
+
+    def finish(page_idx: int, key: str, future: Future) -> None:
+        try:
+            text = future.result()
+        except RuntimeError as error:
+            raise RuntimeError(f"OCR of PDF page {page_idx + 1} failed: {error}") from error
+        if cache is not None:
+            cache.put(key, text)
+        results[page_idx] = text
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for page_idx in page_indices:
+            page = doc[page_idx]
+            # Listing images is much cheaper than extracting text, and a page
+            # without any has nothing to OCR
+            if not page.get_images():
+                continue
+            text = page.get_text()
+            if has_text_layer(text):
+                continue
+            if tesseract is None:
+                missing_tesseract.append(page_idx)
+                results[page_idx] = None
+                continue
+
+            native[page_idx] = text
+            image = render_page(page)
+            key = ocr_key(image)
+            cached = cache.get(key) if cache is not None else None
+            if cached is not None:
+                results[page_idx] = cached
+                continue
+
+            # Bound the rendered pages held in memory while Tesseract catches up
+            while len(pending) >= jobs * QUEUED_PER_JOB:
+                finish(*pending.popleft())
+            pending.append((page_idx, key, pool.submit(run_tesseract, tesseract, image, jobs > 1)))
+
+        while pending:
+            finish(*pending.popleft())
+
+    if missing_tesseract:
+        page_numbers = ", ".join(str(page_idx + 1) for page_idx in missing_tesseract)
+        print(f"Warning: no text layer on PDF pages {page_numbers}, and {TESSERACT} is not on PATH "
+              f"to OCR them; install it with the {OCR_LANGUAGES} languages")
+
+    if cache is not None and cache.hits + cache.misses:
+        print(f"OCR: {cache.hits + cache.misses} pages without a text layer, {cache.hits} from the cache")
+
+    # A mostly blank page with a picture on it: keep what little the PDF had
+    return {
+        page_idx: text
+        for page_idx, text in results.items()
+        if text is None or letter_count(text) > letter_count(native[page_idx])
+    }
@@ -0,0 +1,194 @@
+"""
+Font-aware structured extraction of a rulebook page.
+
+The default text extractor formats plain `get_text()` output, finds headers
+with all-caps regexes and appends every table after the page text. This one
+reads the page once with `get_text("dict")`, which gives every line with its
+font size, weight and block, and classifies lines from that:
+
+- header: set noticeably larger than the page's body text, or a bold line the
+  caps rule accepts
+- bullet: starts with a bullet glyph; following lines of the block that are
+  indented past the glyph continue it
+- paragraph: the other lines of a block, joined, with words hyphenated at a
+  line break put back together
+
+Table regions come from `find_tables()`. That scan is by far the most
+expensive call here and its default strategy only finds tables drawn with
+ruling lines, so it is skipped on pages without vector drawings. Lines inside a
+table's bbox are left out of the paragraph stream and the table is emitted
+where its first line would have been, instead of at the end of the page.
+
+`extract_structured` returns JSON-serializable data, so it can be cached like
+the text extraction; `iter_structured_markdown` formats it.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from collections.abc import Iterator
+
+from pipeline_memory import stage
+from rulebook_markdown import LETTER, PARSE_STYLE, is_header, table_to_markdown
+
+
+HEADER_SIZE_RATIO = 1.15
+HEADER_MAX_LENGTH = 80
+BULLETS = ("•", "●", "▪", "■", "◦")
+BOLD_FLAG = 1 << 4
+# Points a line may stick out of a table's bbox and still belong to it
+TABLE_TOLERANCE = 2.0
+# Points a wrapped bullet line must start right of the bullet glyph
+INDENT_TOLERANCE = 2.0
+
+
+def extract_tables(page) -> list[dict]:
+    """Cell lists of the page's tables, header row first, with their bboxes"""
+    tables = []
+    for table in page.find_tables().tables:
+        rows = table.extract()
+        if not table.header.external:
+            rows = rows[1:]
+        if rows:
+            tables.append({
+                'bbox': list(table.bbox),
+                'rows': [table.header.names] + rows,
+            })
+    return tables
+
+
+def extract_structured(page) -> dict:
+    """Return the page's text lines with font information, and its tables"""
+    with stage("tables"):
+        tables = extract_tables(page) if page.get_cdrawings() else []
+
+    with stage("text"):
+        blocks = page.get_text("dict")["blocks"]
+
+    lines = []
+    for block in blocks:
+        if block["type"] != 0:
+            continue
+        for line in block["lines"]:
+            spans = [span for span in line["spans"] if span["text"].strip()]
+            if not spans:
+                continue
+            lines.append({
+                'block': block["number"],
+                'bbox': [round(value, 1) for value in line["bbox"]],
+                'size': round(max(span["size"] for span in spans), 1),
+                'bold': all(span["flags"] & BOLD_FLAG or "Bold" in span["font"] for span in spans),
+                'text': "".join(span["text"] for span in line["spans"]).strip(),
+            })
+
+    return {'lines': lines, 'tables': tables}
+
+
+def body_size(lines: list[dict]) -> float:
+    """The font size most of the page's characters are set in"""
+    sizes = Counter()
+    for line in lines:
+        sizes[line['size']] += len(line['text'])
+    return sizes.most_common(1)[0][0] if sizes else 0.0
+
+
+def table_containing(line: dict, tables: list[dict]) -> int | None:
+    x0, y0, x1, y1 = line['bbox']
+    center_x, center_y = (x0 + x1) / 2, (y0 + y1) / 2
+    for position, table in enumerate(tables):
+        tx0, ty0, tx1, ty1 = table['bbox']
+        if (tx0 - TABLE_TOLERANCE <= center_x <= tx1 + TABLE_TOLERANCE
+                and ty0 - TABLE_TOLERANCE <= center_y <= ty1 + TABLE_TOLERANCE):
+            return position
+    return None
+
+
+def join_lines(text: str, line: str) -> str:
+    # "сереб-" + "ряными": a word the layout broke across two lines
+    if text.endswith("-") and len(text) > 1 and text[-2].isalpha() and line[:1].islower():
+        return text[:-1] + line
+    return f"{text} {line}"
+
+
+def continues(current: tuple, line: dict) -> bool:
+    """Whether a line goes on with the open paragraph or bullet item"""
+    kind, block, left, _ = current
+    if block != line['block']:
+        return False
+    # A wrapped bullet item is indented past its glyph
+    return kind != 'bullet' or line['bbox'][0] > left + INDENT_TOLERANCE
+
+
+def classify(extracted: dict, with_tables: bool = True) -> Iterator[tuple[str, object]]:
+    """Yield (kind, content) elements in reading order
+
+    kind is 'header', 'paragraph' or 'bullet' with the text as content, or
+    'table' with the cell rows.
+    """
+    lines = extracted['lines']
+    tables = extracted['tables'] if with_tables else []
+    size = body_size(lines)
+    emitted_tables = set()
+    # The open paragraph or bullet item: (kind, block, left edge, text)
+    current = None
+
+    for line in lines:
+        text = line['text']
+        table = table_containing(line, tables)
+        if table is not None:
+            if current:
+                yield current[0], current[3]
+                current = None
+            if table not in emitted_tables:
+                emitted_tables.add(table)
+                yield 'table', tables[table]['rows']
+            continue
+
+        if len(text) <= HEADER_MAX_LENGTH and LETTER.search(text.upper()) and (
+            line['size'] >= size * HEADER_SIZE_RATIO or (line['bold'] and is_header(text, PARSE_STYLE))
+        ):
+            if current:
+                yield current[0], current[3]
+                current = None
+            yield 'header', text
+        elif text.startswith(BULLETS):
+            if current:
+                yield current[0], current[3]
+            current = ('bullet', line['block'], line['bbox'][0], text[1:].strip())
+        elif current and continues(current, line):
+            current = current[:3] + (join_lines(current[3], text),)
+        else:
+            if current:
+                yield current[0], current[3]
+            current = ('paragraph', line['block'], line['bbox'][0], text)
+
+    if current:
+        yield current[0], current[3]
+
+    # Tables whose text did not come through get_text("dict")
+    for position, table in enumerate(tables):
+        if position not in emitted_tables:
+            yield 'table', table['rows']
+
+
+def iter_structured_markdown(extracted: dict, with_tables: bool = True) -> Iterator[str]:
+    """Yield the markdown of a structured page extraction in pieces"""
+    previous = None
+    for kind, content in classify(extracted, with_tables):
+        match kind:
+            case 'header':
+                piece = f"## {content}"
+            case 'bullet':
+                piece = f"- {content}"
+            case 'table':
+                piece = table_to_markdown(content)
+                if not piece:
+                    continue
+            case _:
+                piece = content
+
+        if previous is not None:
+            # Bullet items stay together as one list
+            yield '\n' if kind == previous == 'bullet' else '\n\n'
+        yield piece
+        previous = kind
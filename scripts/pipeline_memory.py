@@ -0,0 +1,215 @@
+"""
+Memory controls and instrumentation for the rulebook PDF pipelines.
+
+`release_page_memory` drops the table finder's per-page state and halves
+MuPDF's resource store (fonts, images and parsed objects it keeps around for
+reuse); the parsers call it after every page in --low-memory mode.
+
+`MemoryReport` backs --memory-report. The parsers mark their stages with
+`stage("toc")`, `stage("ocr")`, `stage("text")`, `stage("tables")`,
+`stage("formatting")` and `stage("write")`; stages nest (text and tables run inside formatting,
+formatting inside write), and everything is charged to the innermost open
+stage, or to "other" outside all of them. For each stage the report gives the
+time spent, the peak RSS while it ran (Linux resets the high-water mark
+through /proc/self/clear_refs; elsewhere it is the process peak so far), the
+peak of Python allocations traced by tracemalloc, and the source lines that
+allocated the most memory the stage kept. Allocation snapshots are slow, so
+they are taken around a stage's 1st, 2nd, 4th, 8th, ... entry only; their
+figures include the stages nested inside.
+
+Only the current process is measured, so run with --jobs 1 to cover the
+extraction itself. `stage()` is a no-op unless a report is running. With
+trace_allocations=False the report only keeps times and peak RSS, which costs
+next to nothing (bench_rulebook.py's throughput numbers come from that).
+"""
+
+from __future__ import annotations
+
+import resource
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+
+STAGES = ("toc", "ocr", "text", "tables", "formatting", "write", "other")
+TOP_ALLOCATORS = 5
+STORE_SHRINK_PERCENT = 50
+CLEAR_REFS = Path("/proc/self/clear_refs")
+PROC_STATUS = Path("/proc/self/status")
+
+_report: MemoryReport | None = None
+
+
+def release_page_memory() -> None:
+    """Drop what PyMuPDF keeps from a page once it is done"""
+    # find_tables leaves the last page's characters and vector edges in module state
+    fitz.table.CHARS.clear()
+    fitz.table.EDGES.clear()
+    # Emptying the store instead makes every page load its fonts again, and
+    # peak RSS grew by ~150 KiB a page doing that
+    fitz.TOOLS.store_shrink(STORE_SHRINK_PERCENT)
+
+
+def peak_rss_kib() -> int:
+    try:
+        for line in PROC_STATUS.read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def reset_peak_rss() -> bool:
+    try:
+        CLEAR_REFS.write_text("5")
+        return True
+    except OSError:
+        return False
+
+
+@dataclass
+class StageStats:
+    seconds: float = 0.0
+    entries: int = 0
+    peak_rss_kib: int = 0
+    peak_traced: int = 0
+    sampled: int = 0
+    # (filename, lineno) -> bytes allocated and still held when sampled entries ended
+    retained: Counter = field(default_factory=Counter)
+
+
+class MemoryReport:
+    def __init__(self, trace_allocations: bool = True) -> None:
+        self.stats = {name: StageStats() for name in STAGES}
+        self.stack: list[str] = []
+        self.per_stage_rss = False
+        self.trace_allocations = trace_allocations
+
+    def start(self) -> None:
+        if self.trace_allocations:
+            tracemalloc.start()
+        self.per_stage_rss = reset_peak_rss()
+        self.started = time.perf_counter()
+        self._restart()
+
+    def _restart(self) -> None:
+        """Begin measuring afresh, leaving the report's own work out"""
+        if self.per_stage_rss:
+            reset_peak_rss()
+        if self.trace_allocations:
+            tracemalloc.reset_peak()
+        self.mark = time.perf_counter()
+
+    def _switch(self) -> None:
+        """Charge everything since the last switch to the innermost open stage"""
+        stats = self.stats[self.stack[-1] if self.stack else "other"]
+        stats.seconds += time.perf_counter() - self.mark
+        stats.peak_rss_kib = max(stats.peak_rss_kib, peak_rss_kib())
+        if self.trace_allocations:
+            stats.peak_traced = max(stats.peak_traced, tracemalloc.get_traced_memory()[1])
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+
+    @contextmanager
+    def stage(self, name: str):
+        self._switch()
+        stats = self.stats[name]
+        stats.entries += 1
+        sampled = self.trace_allocations and stats.entries & (stats.entries - 1) == 0
+        before = self._snapshot() if sampled else None
+        self.stack.append(name)
+        self._restart()
+        try:
+            yield
+        finally:
+            self._switch()
+            self.stack.pop()
+            if before is not None:
+                for difference in self._snapshot().compare_to(before, "lineno"):
+                    frame = difference.traceback[0]
+                    stats.retained[(frame.filename, frame.lineno)] += difference.size_diff
+                stats.sampled += 1
+            self._restart()
+
+    def stop(self) -> None:
+        self._switch()
+        self.total_seconds = time.perf_counter() - self.started
+        if self.trace_allocations:
+            tracemalloc.stop()
+
+    def format(self) -> str:
+        rss_note = "per stage" if self.per_stage_rss else "process peak so far"
+        lines = [
+            f"Memory report ({self.total_seconds:.2f} s measured; peak RSS {rss_note}; "
+            f"bookkeeping excluded from times)",
+            f"  {'stage':<11} {'entries':>7} {'seconds':>8} {'peak RSS':>10} {'traced peak':>12}",
+        ]
+        for name, stats in self.stats.items():
+            if not stats.entries and not stats.seconds:
+                continue
+            lines.append(
+                f"  {name:<11} {stats.entries:>7} {stats.seconds:>8.2f} "
+                f"{stats.peak_rss_kib / 1024:>7.1f} MiB {stats.peak_traced / 2**20:>8.1f} MiB"
+            )
+        for name, stats in self.stats.items():
+            top = [(where, size) for where, size in stats.retained.most_common(TOP_ALLOCATORS) if size > 0]
+            if not top:
+                continue
+            lines.append(f"  {name}: top allocators by memory retained ({stats.sampled} of {stats.entries} entries)")
+            for (filename, lineno), size in top:
+                lines.append(f"    {size / 1024:>9.1f} KiB  {filename}:{lineno}")
+        return "\n".join(lines)
+
+    def as_dict(self) -> dict:
+        return {
+            "seconds": round(self.total_seconds, 4),
+            "perStageRss": self.per_stage_rss,
+            "stages": {
+                name: {
+                    "entries": stats.entries,
+                    "seconds": round(stats.seconds, 4),
+                    "peakRssMb": round(stats.peak_rss_kib / 1024, 1),
+                }
+                for name, stats in self.stats.items()
+                if stats.entries or stats.seconds
+            },
+        }
+
+
+def start_report(trace_allocations: bool = True) -> MemoryReport:
+    global _report
+    _report = MemoryReport(trace_allocations)
+    _report.start()
+    return _report
+
+
+def stop_report() -> MemoryReport:
+    """Stop the running report and return it"""
+    global _report
+    report, _report = _report, None
+    report.stop()
+    return report
+
+
+def finish_report() -> str:
+    """Stop the running report and return it formatted"""
+    return stop_report().format()
+
+
+def stage(name: str):
+    """Context manager marking a pipeline stage for the running report, if any"""
+    return _report.stage(name) if _report is not None else nullcontext()
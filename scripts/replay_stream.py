@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Replay WAV fixtures through `transcribe_with_whisper.py --stream` in real time.
+
+Each fixture's PCM is written to the stream process in small chunks paced to
+the recording's own clock, and every event the process prints is timestamped
+on arrival. Per fixture the harness reports the time to first text (from the
+first audio byte to the first non-empty partial or segment), the lag of each
+committed segment behind the moment its audio finished playing, and the time
+from the end of the recording to the `end` event.
+
+    uv run --with openai-whisper --with numpy python scripts/replay_stream.py
+    python scripts/replay_stream.py --model base.en --speed 2 attack-goblin.wav
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from transcribe_with_whisper import read_wav_layout
+
+
+SCRIPT_PATH = Path(__file__).resolve().parent / "transcribe_with_whisper.py"
+FIXTURES_DIR = Path(__file__).resolve().parent.parent / "fixtures" / "audio"
+CHUNK_MS = 20
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("fixtures", nargs="*", help="WAV files (default: every fixture WAV)")
+    parser.add_argument("--model", default="tiny.en")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--stream-step-seconds", type=float)
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="playback speed relative to real time"
+    )
+    parser.add_argument("--json", type=Path, help="also write the measurements to this file")
+    args = parser.parse_args()
+
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+    return args
+
+
+def fixture_paths(names: list[str]) -> list[Path]:
+    if not names:
+        return sorted(FIXTURES_DIR.glob("*.wav"))
+    return [Path(name) if Path(name).exists() else FIXTURES_DIR / name for name in names]
+
+
+def read_pcm(audio_path: Path) -> tuple[bytes, int, int]:
+    layout = read_wav_layout(audio_path)
+    if layout.sample_width != 2:
+        raise ValueError(f"Stream replay needs 16-bit PCM: {audio_path}")
+
+    with audio_path.open("rb") as audio_file:
+        audio_file.seek(layout.data_offset)
+        pcm = audio_file.read(layout.frame_count * layout.channel_count * 2)
+    return pcm, layout.sample_rate, layout.channel_count
+
+
+def start_stream_process(args: argparse.Namespace, sample_rate: int, channel_count: int):
+    command = [
+        sys.executable,
+        str(SCRIPT_PATH),
+        "--stream",
+        "--model",
+        args.model,
+        "--language",
+        args.language,
+        "--sample-rate",
+        str(sample_rate),
+        "--channels",
+        str(channel_count),
+    ]
+    if args.stream_step_seconds is not None:
+        command += ["--stream-step-seconds", str(args.stream_step_seconds)]
+    return subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=False)
+
+
+def collect_events(stdout, events: list[tuple[float, dict]], ready: threading.Event) -> None:
+    for line in stdout:
+        event = json.loads(line)
+        events.append((time.perf_counter(), event))
+        if event.get("type") == "ready":
+            ready.set()
+    ready.set()  # the process exited before it became ready
+
+
+def replay(args: argparse.Namespace, audio_path: Path) -> dict:
+    pcm, sample_rate, channel_count = read_pcm(audio_path)
+    chunk_bytes = sample_rate * CHUNK_MS // 1000 * channel_count * 2
+    process = start_stream_process(args, sample_rate, channel_count)
+
+    events: list[tuple[float, dict]] = []
+    ready = threading.Event()
+    reader = threading.Thread(target=collect_events, args=(process.stdout, events, ready))
+    reader.start()
+    ready.wait()
+
+    started = time.perf_counter()
+    for offset in range(0, len(pcm), chunk_bytes):
+        # Sleep until this chunk's audio would have been captured.
+        due = started + offset / (sample_rate * channel_count * 2) / args.speed
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        process.stdin.write(pcm[offset : offset + chunk_bytes])
+        process.stdin.flush()
+    audio_done = time.perf_counter()
+    process.stdin.close()
+
+    reader.join()
+    if process.wait() != 0:
+        raise RuntimeError(f"Stream process failed for {audio_path}")
+
+    return summarize(audio_path, events, started, audio_done, args.speed)
+
+
+def summarize(
+    audio_path: Path, events: list[tuple[float, dict]], started: float, audio_done: float, speed: float
+) -> dict:
+    first_text_ms = None
+    segment_lags_ms = []
+    segments = []
+    end_ms = None
+
+    for received, event in events:
+        elapsed_ms = (received - started) * 1000
+        if event.get("text") and first_text_ms is None:
+            first_text_ms = elapsed_ms
+
+        match event.get("type"):
+            case "segment":
+                segments.append(event["text"])
+                segment_lags_ms.append(elapsed_ms - event["endMs"] / speed)
+            case "end":
+                end_ms = (received - audio_done) * 1000
+
+    return {
+        "audioFile": str(audio_path),
+        "firstTextMs": round(first_text_ms) if first_text_ms is not None else None,
+        "segmentLagMs": [round(lag) for lag in segment_lags_ms],
+        "endAfterAudioMs": round(end_ms) if end_ms is not None else None,
+        "partials": sum(event.get("type") == "partial" for _, event in events),
+        "text": " ".join(segments),
+    }
+
+
+def main() -> int:
+    args = parse_args()
+    results = []
+
+    for audio_path in fixture_paths(args.fixtures):
+        result = replay(args, audio_path)
+        results.append(result)
+        lags = result["segmentLagMs"]
+        print(
+            f"{audio_path.name:>30}  first text {result['firstTextMs']} ms"
+            f"  segment lag {max(lags) if lags else '-'} ms max"
+            f"  end +{result['endAfterAudioMs']} ms  {result['partials']} partials"
+            f"  | {result['text']}"
+        )
+
+    first_texts = [result["firstTextMs"] for result in results if result["firstTextMs"] is not None]
+    if first_texts:
+        print(
+            f"time to first text: median {statistics.median(first_texts):.0f} ms,"
+            f" max {max(first_texts)} ms over {len(first_texts)} fixture(s)"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
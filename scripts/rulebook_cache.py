@@ -0,0 +1,109 @@
+"""
+On-disk cache of raw per-page PDF extraction results for the rulebook parsers.
+
+Extracting text and tables with PyMuPDF is by far the slowest part of turning
+the rulebook into markdown, and it does not change while the formatting
+heuristics are being tuned. Each page's raw extraction (text plus table cells
+and bounding boxes, or the structured lines of page_structure.py) is stored as
+one small JSON file, keyed by the SHA-256 of the PDF, the page index, the
+extractor and `EXTRACTOR_VERSION`. Bump the version whenever the
+extraction itself changes so stale entries are not reused.
+
+`OcrCache` holds Tesseract results for scanned pages (see page_ocr.py). Its
+entries are keyed by the rendered page image rather than by the PDF, so
+editing other pages of the PDF does not send a scanned page through OCR again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+
+EXTRACTOR_VERSION = 4
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / ".cache" / "rulebook"
+DEFAULT_OCR_CACHE_DIR = DEFAULT_CACHE_DIR.parent / "rulebook-ocr"
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def pdf_digest(pdf_path: str | Path) -> str:
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as pdf_file:
+        while block := pdf_file.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_json(path: Path, payload: dict) -> None:
+    """Write a cache entry atomically, so concurrent runs never see half of one"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as temp_file:
+            json.dump(payload, temp_file, ensure_ascii=False)
+        os.replace(temp_name, path)
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+
+
+class PageCache:
+    def __init__(self, directory: str | Path, pdf_path: str | Path) -> None:
+        self.directory = Path(directory) / f"{pdf_digest(pdf_path)}-v{EXTRACTOR_VERSION}"
+        self.hits = 0
+        self.misses = 0
+
+    def entry_path(self, page_index: int, kind: str = "text") -> Path:
+        # Each extractor (see parse_rulebook.py --extractor) has its own entries
+        suffix = "" if kind == "text" else f".{kind}"
+        return self.directory / f"page-{page_index:04d}{suffix}.json"
+
+    def has(self, page_index: int, kind: str = "text") -> bool:
+        """Whether the page has an entry, without reading it or counting a hit"""
+        return self.entry_path(page_index, kind).exists()
+
+    def get(self, page_index: int, kind: str = "text") -> dict | None:
+        try:
+            payload = json.loads(self.entry_path(page_index, kind).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            # Missing or damaged entries are re-extracted and overwritten.
+            self.misses += 1
+            return None
+
+        if not isinstance(payload, dict):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return payload
+
+    def put(self, page_index: int, payload: dict, kind: str = "text") -> None:
+        write_json(self.entry_path(page_index, kind), payload)
+
+
+class OcrCache:
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+        self.hits = 0
+        self.misses = 0
+
+    def entry_path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> str | None:
+        try:
+            payload = json.loads(self.entry_path(key).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        if not isinstance(payload, dict) or not isinstance(payload.get("text"), str):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return payload["text"]
+
+    def put(self, key: str, text: str) -> None:
+        write_json(self.entry_path(key), {"text": text})
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Structured export of the bestiary and equipment tables.
+
+The chapters only carry these as markdown tables, so every consumer would have
+to re-parse them to get at the numbers. This reads the tables out of
+`rulebook/10_Bestiary.md` and `rulebook/06_Equipment.md` and writes one typed
+record per creature and item to a compact JSON sidecar, `rulebook/rulebook-data.json`:
+
+    {"version": 1, "sources": {file: sha256}, "creatures": [...], "armor": [...],
+     "weapons": [...], "weaponRanges": [...], "gear": [...], "lightSources": [...],
+     "index": {name: [[collection, position], ...]}, "untyped": [...]}
+
+Numbers are plain ints (distances in feet, prices in copper pieces), dice keep
+their NdN notation, and category names follow the TypeScript domain
+(`Crushing`, `Medium`, `Light`, ...). Every record keeps its source PDF page
+and the original cell text under `raw`. `index` maps a lowercased name, with ё
+folded to е, to the records that carry it.
+
+A cell that does not fit its column's pattern ("от 2 до 4", "1d6+2 или 1d8+2")
+leaves its typed field out and is listed in `untyped`. The rest of the record
+is still exported. parse_rulebook.py runs this after writing the chapters.
+
+    python scripts/rulebook_data.py
+    python scripts/rulebook_data.py --strict   # exit 1 if any cell is untyped
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_RULEBOOK_DIR = REPO_ROOT / "rulebook"
+DEFAULT_OUTPUT_NAME = "rulebook-data.json"
+DATA_VERSION = 1
+
+BESTIARY_FILE = "10_Bestiary.md"
+EQUIPMENT_FILE = "06_Equipment.md"
+
+PAGE_MARKER = re.compile(r'<!-- PDF Page (\d+) -->')
+HEADER = re.compile(r'#{2,6}\s+(.+)')
+SEPARATOR_ROW = re.compile(r'\|(\s*:?-{3,}:?\s*\|)+')
+GROUP_CELL = re.compile(r'\*\*(.+)\*\*')
+
+DICE = r'\d+d\d+(?:[+-]\d+)?'
+DICE_ONLY = re.compile(DICE)
+INTEGER = re.compile(r'[+-]?\d+')
+PRICE = re.compile(r'(\d[\d ]*)\s*(мм|см|зм|пм)')
+UP_TO_FEET = re.compile(r'≤\s*(\d+)′')
+FEET_RANGE = re.compile(r'(\d+)–(\d+)′')
+COUNT_AND_DETAIL = re.compile(r'(\d+)(?:\s+или\s+(\d+))?\s*\((.+)\)')
+GROUP_SIZE = re.compile(rf'([^()]+?)(?:\s*\(({DICE})\))?')
+HIT_DICE = re.compile(r'(\d+|½)(\*?)\s*\((\d+)\s+хит\w*\)')
+# "50′", "160′ (полёт)" or "10′ ➙ 40′ (прыжок)"
+SPEED = re.compile(r'(?:(\d+)′\s*➙\s*)?(\d+)′(?:\s*\((.+)\))?')
+DAMAGE = re.compile(rf'({DICE}(?:/{DICE})*)(?:\s*\+\s*(.+))?')
+
+COPPER_PER_COIN = {"мм": 1, "см": 10, "зм": 100, "пм": 1000}
+DAMAGE_TYPES = {"Д": "Crushing", "П": "Piercing", "Р": "Slashing"}
+WEAPON_SIZES = {
+    "Миниатюрное": "Miniature",
+    "Малое": "Small",
+    "Среднее": "Medium",
+    "Большое": "Large",
+    "Огромное": "Massive",
+}
+ARMOR_CATEGORIES = {"—": "None", "Лёгкая": "Light", "Средняя": "Medium", "Тяжёлая": "Heavy"}
+
+CREATURE_STATS = {
+    "Организация": "organization",
+    "Кости хитов": "hitDice",
+    "Класс Защиты": "armorClass",
+    "Скорость": "speed",
+    "Атаки": "attacks",
+    "Урон": "damage",
+    "Спасброски": "saves",
+    "Мораль": "morale",
+}
+
+
+class Untyped(ValueError):
+    """A cell that does not match its column's pattern."""
+
+
+@dataclass
+class Table:
+    file: str
+    page: int | None
+    section: str
+    columns: list[str]
+    rows: list[list[str]] = field(default_factory=list)
+
+
+@dataclass
+class Export:
+    collections: dict[str, list[dict]] = field(default_factory=dict)
+    untyped: list[dict] = field(default_factory=list)
+
+    def add(self, collection: str, record: dict) -> None:
+        self.collections.setdefault(collection, []).append(record)
+
+    def untyped_cell(self, table: Table, name: str, column: str, value: str, error: Exception) -> None:
+        self.untyped.append({
+            "file": table.file,
+            "page": table.page,
+            "name": name,
+            "column": column,
+            "value": value,
+            "reason": str(error),
+        })
+
+
+def fold_name(name: str) -> str:
+    return name.lower().replace("ё", "е")
+
+
+def plain(text: str) -> str:
+    # Tables use the typographic minus
+    return text.replace("−", "-").strip()
+
+
+def read_tables(path: Path) -> Iterator[Table]:
+    """Yield the markdown tables of a chapter with their PDF page and enclosing `##` header."""
+    page: int | None = None
+    section = ""
+    table: Table | None = None
+
+    for line in path.read_text(encoding="utf-8").split("\n"):
+        stripped = line.strip()
+        if stripped.startswith("|") and stripped.endswith("|"):
+            cells = [cell.strip() for cell in stripped[1:-1].split("|")]
+            if table is None:
+                table = Table(path.name, page, section, cells)
+            elif not SEPARATOR_ROW.fullmatch(stripped):
+                table.rows.append(cells)
+            elif table.rows:
+                # Two tables printed without a blank line between them: the
+                # row above this separator is the next table's header
+                columns = table.rows.pop()
+                yield table
+                table = Table(path.name, page, section, columns)
+            continue
+
+        if table is not None:
+            yield table
+            table = None
+        if marker := PAGE_MARKER.fullmatch(stripped):
+            page = int(marker.group(1))
+        elif heading := HEADER.fullmatch(stripped):
+            section = heading.group(1).strip()
+
+    if table is not None:
+        yield table
+
+
+def display_name(header: str) -> str:
+    """'ГИГАНТСКАЯ ЖАБА' -> 'Гигантская жаба'"""
+    return header.capitalize() if header.isupper() else header
+
+
+# Cell parsers. Each returns the typed fields for one cell or raises Untyped.
+
+def integer(value: str) -> int:
+    if not INTEGER.fullmatch(plain(value)):
+        raise Untyped("expected an integer")
+    return int(plain(value))
+
+
+def price(value: str) -> dict:
+    match = PRICE.fullmatch(value.strip())
+    if not match:
+        raise Untyped("expected a price in мм/см/зм/пм")
+    amount = int(match.group(1).replace(" ", ""))
+    return {"priceCopper": amount * COPPER_PER_COIN[match.group(2)]}
+
+
+def dice(value: str) -> str:
+    if not DICE_ONLY.fullmatch(value.strip()):
+        raise Untyped("expected dice notation")
+    return value.strip()
+
+
+def range_band(value: str) -> int:
+    """Upper bound in feet of '≤ 50′' or '51–200′'"""
+    value = value.strip()
+    if match := UP_TO_FEET.fullmatch(value):
+        return int(match.group(1))
+    if match := FEET_RANGE.fullmatch(value):
+        return int(match.group(2))
+    raise Untyped("expected a distance band in feet")
+
+
+def lookup(table: dict[str, str], what: str) -> Callable[[str], str]:
+    def parse(value: str) -> str:
+        try:
+            return table[value.strip()]
+        except KeyError:
+            raise Untyped(f"unknown {what}") from None
+    return parse
+
+
+def damage_types(value: str) -> list[str]:
+    return [lookup(DAMAGE_TYPES, "damage type")(code) for code in value.split("/")]
+
+
+def organization(value: str) -> dict:
+    match = GROUP_SIZE.fullmatch(value.strip())
+    if not match:
+        raise Untyped("expected 'Group (NdN)' or a plain name")
+    fields = {"organization": match.group(1)}
+    if match.group(2):
+        fields["numberAppearing"] = match.group(2)
+    return fields
+
+
+def hit_dice(value: str) -> dict:
+    match = HIT_DICE.fullmatch(value.strip())
+    if not match:
+        raise Untyped("expected 'N (M хитов)'")
+    dice_count = 0.5 if match.group(1) == "½" else int(match.group(1))
+    return {
+        "hitDice": dice_count,
+        "hitDiceBonus": match.group(2) == "*",
+        "hitPoints": int(match.group(3)),
+    }
+
+
+def speed(value: str) -> dict:
+    match = SPEED.fullmatch(value.strip())
+    if not match:
+        raise Untyped("expected a speed in feet")
+    ground, other, mode = match.groups()
+    if mode is None:
+        return {"speed": int(other)}
+    fields = {"speed": int(ground)} if ground else {}
+    fields["speedModes"] = {mode: int(other)}
+    return fields
+
+
+def attacks(value: str) -> dict:
+    match = COUNT_AND_DETAIL.fullmatch(value.strip())
+    if not match:
+        raise Untyped("expected 'N (attacks)'")
+    fields = {"attackCount": int(match.group(1)), "attackWith": match.group(3)}
+    if match.group(2):
+        fields["attackCountMax"] = int(match.group(2))
+    return fields
+
+
+def damage(value: str) -> dict:
+    match = DAMAGE.fullmatch(value.strip())
+    if not match:
+        raise Untyped("expected dice per attack")
+    fields = {"damageDice": match.group(1).split("/")}
+    if match.group(2):
+        fields["damageEffect"] = match.group(2)
+    return fields
+
+
+def as_field(name: str, parse: Callable[[str], object]) -> Callable[[str], dict]:
+    return lambda value: {name: parse(value)}
+
+
+CREATURE_PARSERS = {
+    "organization": organization,
+    "hitDice": hit_dice,
+    "armorClass": as_field("armorClass", integer),
+    "speed": speed,
+    "attacks": attacks,
+    "damage": damage,
+    "saves": as_field("saveBonus", integer),
+    "morale": as_field("morale", integer),
+}
+
+
+def typed_fields(export: Export, table: Table, name: str, cells: dict[str, str],
+                 parsers: dict[str, Callable[[str], dict]]) -> dict:
+    fields: dict = {}
+    for column, parse in parsers.items():
+        value = cells.get(column)
+        if value is None or not value.strip():
+            continue
+        try:
+            fields.update(parse(value))
+        except Untyped as error:
+            export.untyped_cell(table, name, column, value, error)
+    return fields
+
+
+def record(table: Table, name: str, group: str | None, fields: dict, raw: dict) -> dict:
+    entry = {"name": name}
+    if group:
+        entry["group"] = group
+    entry.update(fields)
+    entry["page"] = table.page
+    entry["raw"] = raw
+    return entry
+
+
+def export_creature(export: Export, table: Table) -> None:
+    name = display_name(table.section)
+    stats = {CREATURE_STATS.get(row[0], row[0]): row[1] for row in table.rows if len(row) >= 2}
+    fields = typed_fields(export, table, name, stats, CREATURE_PARSERS)
+    export.add("creatures", record(table, name, None, fields, stats))
+
+
+def export_grouped_rows(export: Export, table: Table, collection: str, keys: list[str],
+                        parsers: dict[str, Callable[[str], dict]]) -> None:
+    """One record per row; a row with only a bold first cell starts a group."""
+    group = None
+    for row in table.rows:
+        if heading := GROUP_CELL.fullmatch(row[0]):
+            group = heading.group(1)
+            continue
+        cells = dict(zip(keys, row))
+        name = cells.pop("name")
+        fields = typed_fields(export, table, name, cells, parsers)
+        export.add(collection, record(table, name, group, fields, cells))
+
+
+def export_gear(export: Export, table: Table) -> None:
+    """The gear list is two name/price column pairs printed side by side."""
+    for half in (slice(0, 2), slice(2, 4)):
+        column = Table(table.file, table.page, table.section, table.columns[half],
+                       [row[half] for row in table.rows if any(row[half])])
+        export_grouped_rows(export, column, "gear", ["name", "price"], {"price": price})
+
+
+ARMOR_PARSERS = {
+    "category": as_field("armorCategory", lookup(ARMOR_CATEGORIES, "armor category")),
+    "price": price,
+    "penalty": as_field("skillPenalty", integer),
+    # The shield row gives a bonus ("+1") rather than a base class
+    "baseAC": lambda value: {"acBonus" if value.startswith("+") else "baseAC": integer(value)},
+}
+WEAPON_PARSERS = {
+    "size": as_field("size", lookup(WEAPON_SIZES, "weapon size")),
+    "price": price,
+    "damageType": as_field("damageType", damage_types),
+    "damage": as_field("damageDice", dice),
+}
+RANGE_PARSERS = {
+    "close": as_field("rangeClose", range_band),
+    "medium": as_field("rangeMedium", range_band),
+    "long": as_field("rangeLong", range_band),
+}
+LIGHT_PARSERS = {
+    "bright": as_field("brightFeet", range_band),
+    "dim": as_field("dimFeet", range_band),
+}
+
+# First header cell -> how to export the table
+EQUIPMENT_TABLES: dict[str, Callable[[Export, Table], None]] = {
+    "Защита": lambda export, table: export_grouped_rows(
+        export, table, "armor", ["name", "category", "price", "penalty", "baseAC"], ARMOR_PARSERS),
+    "Оружие": lambda export, table: (
+        export_grouped_rows(export, table, "weapons",
+                            ["name", "size", "price", "damageType", "damage"], WEAPON_PARSERS)
+        if table.columns[1] == "Размер" else
+        export_grouped_rows(export, table, "weaponRanges",
+                            ["name", "close", "medium", "long"], RANGE_PARSERS)
+    ),
+    "Прочее снаряжение": export_gear,
+    "Источник света": lambda export, table: export_grouped_rows(
+        export, table, "lightSources", ["name", "bright", "dim"], LIGHT_PARSERS),
+}
+
+
+def build_export(rulebook_dir: Path) -> tuple[dict, list[dict]]:
+    export = Export()
+    for name in ("creatures", "armor", "weapons", "weaponRanges", "gear", "lightSources"):
+        export.collections[name] = []
+
+    for table in read_tables(rulebook_dir / BESTIARY_FILE):
+        if table.columns[:2] == ["Характеристика", "Значение"]:
+            export_creature(export, table)
+
+    for table in read_tables(rulebook_dir / EQUIPMENT_FILE):
+        if handler := EQUIPMENT_TABLES.get(table.columns[0]):
+            handler(export, table)
+
+    index: dict[str, list] = {}
+    for collection, records in export.collections.items():
+        for position, entry in enumerate(records):
+            index.setdefault(fold_name(entry["name"]), []).append([collection, position])
+
+    data = {
+        "version": DATA_VERSION,
+        "sources": {
+            name: hashlib.sha256((rulebook_dir / name).read_bytes()).hexdigest()
+            for name in (BESTIARY_FILE, EQUIPMENT_FILE)
+        },
+        **export.collections,
+        "index": index,
+        "untyped": export.untyped,
+    }
+    return data, export.untyped
+
+
+def write_export(data: dict, output_path: Path) -> None:
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=output_path.parent, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as temp_file:
+            json.dump(data, temp_file, ensure_ascii=False, separators=(",", ":"))
+            temp_file.write("\n")
+        os.replace(temp_name, output_path)
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+
+
+def export_rulebook_data(rulebook_dir: Path = DEFAULT_RULEBOOK_DIR, output_path: Path | None = None) -> dict:
+    """Write the sidecar; returns record counts per collection and the untyped cells."""
+    output_path = output_path or rulebook_dir / DEFAULT_OUTPUT_NAME
+    data, untyped = build_export(rulebook_dir)
+    write_export(data, output_path)
+    counts = {name: len(data[name]) for name in data if isinstance(data[name], list) and name != "untyped"}
+    return {"counts": counts, "untyped": untyped, "path": str(output_path)}
+
+
+def format_untyped(cell: dict) -> str:
+    return f"  {cell['file']} p.{cell['page']} {cell['name']} / {cell['column']}: {cell['value']!r} ({cell['reason']})"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rulebook-dir", type=Path, default=DEFAULT_RULEBOOK_DIR)
+    parser.add_argument("--output", type=Path, help=f"default: <rulebook-dir>/{DEFAULT_OUTPUT_NAME}")
+    parser.add_argument("--strict", action="store_true", help="exit 1 if any cell could not be typed")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    result = export_rulebook_data(args.rulebook_dir, args.output)
+
+    counts = ", ".join(f"{count} {name}" for name, count in result["counts"].items())
+    print(f"Wrote {counts} to {result['path']}")
+    if result["untyped"]:
+        print(f"{len(result['untyped'])} cells could not be typed:")
+        for cell in result["untyped"]:
+            print(format_untyped(cell))
+
+    return 1 if args.strict and result["untyped"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Full-text search over the generated rulebook chapters.
+
+`build` splits every `rulebook/*.md` chapter into sections at `##` headers and
+`<!-- PDF Page N -->` markers and stores them in a SQLite FTS5 table, together
+with the chapter, the header the section belongs to and its PDF page. Each
+chapter's SHA-256 is recorded, so a rebuild only re-indexes chapters that
+changed and drops chapters that disappeared. parse_rulebook.py runs it after
+writing the chapters.
+
+`query` returns ranked snippets. Russian is handled in two steps. SQLite's
+unicode61 tokenizer folds case (and Latin diacritics), but not ё, so ё is
+folded to е before indexing and querying. Each query word is then reduced
+with a light suffix-stripping stemmer and matched as a prefix, so
+"заклинаниями" finds "заклинание", "заклинания" and so on.
+
+    python scripts/rulebook_index.py build
+    python scripts/rulebook_index.py query "огненный шар"
+    python scripts/rulebook_index.py query --limit 3 --json гоблин
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_RULEBOOK_DIR = REPO_ROOT / "rulebook"
+INDEX_NAME = "index.sqlite"
+DEFAULT_DB_PATH = DEFAULT_RULEBOOK_DIR / INDEX_NAME
+SCHEMA_VERSION = 1
+
+PAGE_MARKER = re.compile(r'<!-- PDF Page (\d+) -->')
+HEADER = re.compile(r'#{1,6}\s+(.+)')
+WORD = re.compile(r'\w+')
+# "бое-\nприпасы": a word the PDF layout hyphenated across two lines
+LINE_BREAK_HYPHEN = re.compile(r'(?<=\w)-\n(?=[a-zа-яё])')
+CYRILLIC_WORD = re.compile(r'[а-яё]+')
+
+# Longest first; a suffix is only removed when at least MIN_STEM letters remain.
+RUSSIAN_SUFFIXES = sorted(
+    {
+        # adjectives and participles
+        "ыми", "ими", "ого", "его", "ому", "ему", "ая", "яя", "ое", "ее", "ые", "ие", "ый",
+        "ий", "ой", "ую", "юю", "ых", "их", "ым", "им", "ем", "ом",
+        # nouns
+        "иями", "ями", "ами", "ией", "иях", "ях", "ах", "ия", "ие", "ии", "ию", "ей", "ев",
+        "ов", "ам", "ям", "ью", "ья", "ье", "а", "я", "о", "е", "ы", "и", "у", "ю", "ь",
+        # verbs
+        "ться", "тся", "ешь", "ете", "ить", "ать", "ять", "еть", "ует", "уют", "ют", "ут",
+        "ет", "ит", "ат", "ят", "ть", "л", "ла", "ли", "ло",
+    },
+    key=len,
+    reverse=True,
+)
+MIN_STEM = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chapters (file TEXT PRIMARY KEY, title TEXT NOT NULL, sha256 TEXT NOT NULL);
+CREATE VIRTUAL TABLE IF NOT EXISTS sections USING fts5(
+    header,
+    body,
+    file UNINDEXED,
+    chapter UNINDEXED,
+    page UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3 4'
+);
+"""
+
+
+@dataclass(frozen=True)
+class Section:
+    header: str
+    body: str
+    page: int | None
+
+
+def fold(text: str) -> str:
+    return text.replace("ё", "е").replace("Ё", "Е")
+
+
+def stem(word: str) -> str:
+    word = fold(word.lower())
+    if not CYRILLIC_WORD.fullmatch(word):
+        return word
+    for suffix in RUSSIAN_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[: -len(suffix)]
+    return word
+
+
+def split_sections(markdown: str) -> tuple[str, list[Section]]:
+    """Return the chapter title and its sections in reading order."""
+    title = ""
+    sections: list[Section] = []
+    header = ""
+    page: int | None = None
+    body: list[str] = []
+
+    def flush() -> None:
+        text = LINE_BREAK_HYPHEN.sub("", "\n".join(body)).strip()
+        if text:
+            sections.append(Section(header, text, page))
+        body.clear()
+
+    for line in markdown.split("\n"):
+        stripped = line.strip()
+        if marker := PAGE_MARKER.fullmatch(stripped):
+            flush()
+            page = int(marker.group(1))
+        elif heading := HEADER.fullmatch(stripped):
+            flush()
+            if stripped.startswith("# ") and not title:
+                title = heading.group(1).strip()
+            else:
+                header = heading.group(1).strip()
+        else:
+            body.append(line)
+
+    flush()
+    return title, sections
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(db_path)
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    if version != SCHEMA_VERSION:
+        # Older or foreign layout: start over rather than migrate.
+        connection.executescript(
+            "DROP TABLE IF EXISTS sections; DROP TABLE IF EXISTS chapters;"
+        )
+        connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def update_index(rulebook_dir: Path = DEFAULT_RULEBOOK_DIR, db_path: Path = DEFAULT_DB_PATH) -> dict:
+    """Re-index changed chapters; returns counts of indexed, unchanged and removed chapters."""
+    chapter_paths = sorted(rulebook_dir.glob("*.md"))
+    stats = {"indexed": 0, "unchanged": 0, "removed": 0}
+
+    with connect(db_path) as connection:
+        known = dict(connection.execute("SELECT file, sha256 FROM chapters"))
+
+        for path in chapter_paths:
+            content = path.read_bytes()
+            digest = hashlib.sha256(content).hexdigest()
+            if known.pop(path.name, None) == digest:
+                stats["unchanged"] += 1
+                continue
+
+            title, sections = split_sections(content.decode("utf-8"))
+            connection.execute("DELETE FROM sections WHERE file = ?", (path.name,))
+            connection.executemany(
+                "INSERT INTO sections (header, body, file, chapter, page) VALUES (?, ?, ?, ?, ?)",
+                (
+                    (fold(section.header), fold(section.body), path.name, title, section.page)
+                    for section in sections
+                ),
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO chapters (file, title, sha256) VALUES (?, ?, ?)",
+                (path.name, title, digest),
+            )
+            stats["indexed"] += 1
+
+        for removed in known:
+            connection.execute("DELETE FROM sections WHERE file = ?", (removed,))
+            connection.execute("DELETE FROM chapters WHERE file = ?", (removed,))
+            stats["removed"] += 1
+
+    connection.close()
+    return stats
+
+
+def match_expression(query: str) -> str:
+    terms = [stem(word) for word in WORD.findall(query)]
+    if not terms:
+        raise ValueError("Query has no searchable words")
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search(db_path: Path, query: str, limit: int = 10) -> Iterator[dict]:
+    if not db_path.exists():
+        raise FileNotFoundError(f"No index at {db_path}; run 'rulebook_index.py build' first")
+
+    connection = sqlite3.connect(db_path)
+    try:
+        rows = connection.execute(
+            """
+            SELECT file, chapter, page, header,
+                   snippet(sections, -1, '[', ']', '…', 16),
+                   bm25(sections, 5.0, 1.0)
+            FROM sections
+            WHERE sections MATCH ?
+            ORDER BY bm25(sections, 5.0, 1.0)
+            LIMIT ?
+            """,
+            (match_expression(query), limit),
+        ).fetchall()
+    finally:
+        connection.close()
+
+    for file, chapter, page, header, snippet, rank in rows:
+        yield {
+            "file": file,
+            "chapter": chapter,
+            "page": page,
+            "header": header,
+            "snippet": " ".join(snippet.split()),
+            "rank": round(rank, 3),
+        }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="index new and changed chapters")
+    build_parser.add_argument("--rulebook-dir", type=Path, default=DEFAULT_RULEBOOK_DIR)
+
+    query_parser = commands.add_parser("query", help="search the index")
+    query_parser.add_argument("query", nargs="+")
+    query_parser.add_argument("--limit", type=int, default=10)
+    query_parser.add_argument("--json", action="store_true", help="print one JSON object per result")
+
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+
+    match args.command:
+        case "build":
+            stats = update_index(args.rulebook_dir, args.db)
+            print(
+                f"Indexed {stats['indexed']} chapters ({stats['unchanged']} unchanged,"
+                f" {stats['removed']} removed) in {args.db}"
+            )
+        case "query":
+            try:
+                results = list(search(args.db, " ".join(args.query), args.limit))
+            except (ValueError, FileNotFoundError) as error:
+                print(error, file=sys.stderr)
+                return 2
+            for result in results:
+                if args.json:
+                    print(json.dumps(result, ensure_ascii=False))
+                    continue
+                location = f"{result['file']} p.{result['page']}" if result["page"] else result["file"]
+                header = f" § {result['header']}" if result["header"] else ""
+                print(f"{location}{header}\n    {result['snippet']}")
+            if not results:
+                print("No matches", file=sys.stderr)
+                return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""
+Shared page-text → markdown formatting for the rulebook parsers.
+
+parse_rulebook.py and split_rulebook.py turn the text of a PDF page into
+markdown with the same small set of rules: strip extraction artifacts, turn
+capitalized lines into `##` headers and, in parse_rulebook, `•` into list
+items. The scripts have always differed in the details (which lines count as
+headers, how headers are spaced, whether lines are stripped), so each one
+passes its own `MarkdownStyle`; the pass itself, and its precompiled regexes,
+are shared.
+
+`table_to_markdown` renders extracted table cells for both scripts.
+
+Everything here works on iterators of lines or text pieces, so a chapter can
+be streamed page by page into its output file instead of being assembled in
+memory first.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+
+WRITE_BUFFER_SIZE = 1 << 16
+
+PAGE_MARKER = re.compile(r'--- PAGE \d+ ---')
+PAGE_MARKER_LINE = re.compile(r'--- PAGE \d+ ---\n?')
+FONT_TAG = re.compile(r'<[^>]+>')
+OCR_TAG = re.compile(r'\[OCR\]')
+BLANK_LINES = re.compile(r'\n{3,}')
+CYRILLIC_CAPS_LINE = re.compile(r'[А-ЯЁ\s\-\(\)]+')
+LETTER = re.compile(r'[A-ZА-ЯЁ]')
+
+
+@dataclass(frozen=True)
+class MarkdownStyle:
+    # Artifacts removed from the raw page text, in order
+    artifacts: tuple[re.Pattern, ...]
+    # Collapse runs of three or more newlines into one blank line
+    collapse_blank_lines: bool
+    # "cyrillic-caps": only capital Cyrillic letters, spaces, dashes and
+    # parentheses; "upper": anything str.isupper() accepts with a capital letter
+    header_rule: str
+    header_min_length: int
+    header_max_length: int
+    header_template: str
+    convert_bullets: bool
+    # Emit stripped lines (and '' for blank ones) instead of the lines as read
+    strip_lines: bool
+
+
+# parse_rulebook.py
+PARSE_STYLE = MarkdownStyle(
+    artifacts=(PAGE_MARKER, FONT_TAG),
+    collapse_blank_lines=False,
+    header_rule="cyrillic-caps",
+    header_min_length=2,
+    header_max_length=60,
+    header_template="\n## {}\n",
+    convert_bullets=True,
+    strip_lines=True,
+)
+
+# scripts/split_rulebook.py
+SPLIT_STYLE = MarkdownStyle(
+    artifacts=(PAGE_MARKER_LINE, OCR_TAG),
+    collapse_blank_lines=True,
+    header_rule="upper",
+    header_min_length=3,
+    header_max_length=100,
+    header_template="## {}",
+    convert_bullets=False,
+    strip_lines=False,
+)
+
+
+def clean_text(text: str, style: MarkdownStyle) -> str:
+    """Remove extraction artifacts from a page's text"""
+    for artifact in style.artifacts:
+        text = artifact.sub('', text)
+    if style.collapse_blank_lines:
+        text = BLANK_LINES.sub('\n\n', text)
+    return text.strip()
+
+
+def is_header(stripped: str, style: MarkdownStyle) -> bool:
+    if not style.header_min_length <= len(stripped) <= style.header_max_length:
+        return False
+    if style.header_rule == "cyrillic-caps":
+        return CYRILLIC_CAPS_LINE.fullmatch(stripped) is not None
+    return stripped.isupper() and LETTER.search(stripped) is not None
+
+
+def format_lines(lines: Iterable[str], style: MarkdownStyle) -> Iterator[str]:
+    """Yield the markdown line for each cleaned text line"""
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            yield '' if style.strip_lines else line
+        elif is_header(stripped, style):
+            yield style.header_template.format(stripped)
+        elif style.convert_bullets and stripped.startswith('•'):
+            yield f"- {stripped[1:].strip()}"
+        else:
+            yield stripped if style.strip_lines else line
+
+
+def format_page_text(text: str, style: MarkdownStyle) -> Iterator[str]:
+    """Clean a page's text and yield its markdown lines"""
+    return format_lines(clean_text(text, style).split('\n'), style)
+
+
+def table_to_markdown(table_data: list[list[str | None]]) -> str:
+    """Convert 2D array to markdown table; the first row is the header
+
+    Note: pdfplumber and PyMuPDF may extract tables with extra empty
+    columns due to PDF layout; columns empty in every row are dropped.
+    Returns "" for a table without data rows.
+    """
+    if not table_data:
+        return ""
+
+    # Clean None values and convert to strings
+    cleaned = []
+    for row in table_data:
+        cleaned_row = [str(cell).strip() if cell else "" for cell in row]
+        cleaned.append(cleaned_row)
+
+    if not cleaned:
+        return ""
+
+    # Remove fully empty columns
+    num_cols = max(len(row) for row in cleaned)
+    cols_to_keep = []
+    for col_idx in range(num_cols):
+        has_content = False
+        for row in cleaned:
+            if col_idx < len(row) and row[col_idx]:
+                has_content = True
+                break
+        if has_content:
+            cols_to_keep.append(col_idx)
+
+    # Filter rows to keep only non-empty columns
+    filtered = []
+    for row in cleaned:
+        filtered_row = [row[i] if i < len(row) else "" for i in cols_to_keep]
+        filtered.append(filtered_row)
+
+    # A header with no rows under it is not a table (the DataFrames
+    # parse_rulebook used to build skipped these as empty)
+    if len(filtered) < 2 or not cols_to_keep:
+        return ""
+
+    # Build markdown table
+    lines = []
+
+    # Header row
+    header = filtered[0]
+    lines.append("| " + " | ".join(header) + " |")
+
+    # Separator
+    lines.append("| " + " | ".join(["---"] * len(header)) + " |")
+
+    # Data rows
+    for row in filtered[1:]:
+        # Pad row if shorter than header
+        while len(row) < len(header):
+            row.append("")
+        lines.append("| " + " | ".join(row[:len(header)]) + " |")
+
+    return "\n".join(lines)
+
+
+def interleave(pieces: Iterable[str], separator: str = '\n') -> Iterator[str]:
+    """Yield the pieces with the separator between them, like a streamed str.join"""
+    for index, piece in enumerate(pieces):
+        if index:
+            yield separator
+        yield piece
+
+
+def write_markdown(path: str | Path, pieces: Iterable[str]) -> None:
+    """Stream text pieces into a file through a buffered writer"""
+    with open(path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as output:
+        output.writelines(pieces)
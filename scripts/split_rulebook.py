@@ -2,19 +2,54 @@
 """
 PDF to Markdown Splitter for Hellenvald Core Rulebook
 Extracts sections from PDF and converts to individual Markdown files.
+
+Tables are only extracted from pages that belong to a section. By default
+pdfplumber finds them (its per-page caches are released as soon as a page is
+done); --table-engine pymupdf uses PyMuPDF's find_tables instead, so a single
+document handle serves both text and tables.
+
+Chapters whose pages, page range and conversion code are unchanged since the
+last run (according to the build manifest, see build_manifest.py) are skipped;
+--force rebuilds them all.
+
+Pages without a usable text layer (scans) are OCRed with Tesseract, several
+at a time, instead of taking their text from the PDF (see page_ocr.py);
+--no-ocr turns that off.
+
+With --jobs N pages are extracted and converted by N worker processes, each
+opening the PDF itself; the output is identical to a sequential run.
+
+--low-memory releases PyMuPDF's caches after every page, in the workers too.
+Unlike parse_rulebook.py it still hands the workers all pages at once: every
+run of pages opens the document in pdfplumber again, which cost more memory
+than holding the processed pages. --memory-report prints time, peak RSS and
+the top tracemalloc allocators per stage (see pipeline_memory.py).
 """
 
+import argparse
 import fitz  # PyMuPDF (pymupdf package imports as 'fitz')
+import multiprocessing
 import pdfplumber
 import re
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Tuple, Dict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import page_ocr
+import pipeline_memory
+import rulebook_markdown
+from build_manifest import BuildManifest
+from page_ocr import find_tesseract, ocr_pages
+from pipeline_memory import release_page_memory, stage
+from rulebook_cache import DEFAULT_OCR_CACHE_DIR
+from rulebook_markdown import SPLIT_STYLE, format_page_text, interleave, table_to_markdown, write_markdown
 
 # Constants
 PDF_PATH = "Hellenvald Core Rulebook.pdf"
 OUTPUT_DIR = "output/rulebook"
 TOC_PAGE = 7  # Page number (1-indexed)
+TABLE_ENGINES = ("pdfplumber", "pymupdf")
 
 
 def extract_toc(pdf_doc) -> List[Tuple[str, int]]:
@@ -41,145 +76,169 @@ def extract_toc(pdf_doc) -> List[Tuple[str, int]]:
     return sections
 
 
-def extract_tables(pdf_path: str) -> Dict[int, List]:
-    """Extract all tables with pdfplumber, return {page_num: [tables]}"""
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Split the rulebook PDF into markdown files.")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="worker processes for page extraction (default: %(default)s)")
+    parser.add_argument("--force", action="store_true",
+                        help="rebuild every chapter even if the build manifest says it is up to date")
+    parser.add_argument("--table-engine", choices=TABLE_ENGINES, default="pdfplumber",
+                        help="library used to find tables (default: %(default)s)")
+    parser.add_argument("--no-ocr", action="store_true",
+                        help="keep the native text of pages without a text layer instead of OCRing them")
+    parser.add_argument("--ocr-jobs", type=int, default=os.cpu_count() or 1,
+                        help="Tesseract processes run at once (default: %(default)s)")
+    parser.add_argument("--low-memory", action="store_true",
+                        help="release PDF caches after every page")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="print time, peak RSS and top allocators per stage (this process only; "
+                             "use --jobs 1 to include extraction)")
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.ocr_jobs < 1:
+        parser.error("--ocr-jobs must be at least 1")
+    return args
+
+
+def extract_tables(pdf_path: str, page_indices: Optional[List[int]] = None) -> Dict[int, List]:
+    """Extract tables with pdfplumber, return {page_num: [tables]}
+
+    Args:
+        page_indices: PDF page indices (0-based) to scan; all pages when omitted
+    """
     tables_by_page = {}
+    page_numbers = None if page_indices is None else [page_idx + 1 for page_idx in page_indices]
 
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_num, page in enumerate(pdf.pages, start=1):
+    # pages= keeps pdfplumber from parsing pages that are never written.
+    with pdfplumber.open(pdf_path, pages=page_numbers) as pdf:
+        for page in pdf.pages:
             tables = page.extract_tables()
             if tables:
-                tables_by_page[page_num] = tables
+                tables_by_page[page.page_number] = tables
+            # Drop the page's parsed objects; only the table cells are kept.
+            page.close()
 
     return tables_by_page
 
 
-def clean_text(text: str) -> str:
-    """Remove OCR artifacts, excessive newlines"""
-    # Remove page markers
-    text = re.sub(r'--- PAGE \d+ ---\n?', '', text)
-
-    # Remove [OCR] tags
-    text = re.sub(r'\[OCR\]', '', text)
-
-    # Clean excessive newlines (more than 2 consecutive)
-    text = re.sub(r'\n{3,}', '\n\n', text)
-
-    return text.strip()
-
-
-def convert_headers(text: str) -> str:
-    """Convert ALL CAPS lines to ## markdown headers"""
-    lines = text.split('\n')
-    result = []
-
-    for line in lines:
-        stripped = line.strip()
-        # Check if line is ALL CAPS and has reasonable length (3-100 chars)
-        if stripped and stripped.isupper() and 3 <= len(stripped) <= 100:
-            # Skip if it's just numbers or special chars
-            if re.search(r'[A-ZА-ЯЁ]', stripped):
-                result.append(f"## {stripped}")
-                continue
-
-        result.append(line)
+def extract_tables_pymupdf(pdf_doc, page_indices: List[int]) -> Dict[int, List]:
+    """Extract tables with PyMuPDF's find_tables, return {page_num: [tables]}"""
+    tables_by_page = {}
 
-    return '\n'.join(result)
+    for page_idx in page_indices:
+        tables = [table.extract() for table in pdf_doc[page_idx].find_tables().tables]
+        if tables:
+            tables_by_page[page_idx + 1] = tables
 
+    return tables_by_page
 
-def table_to_markdown(table_data: List[List[str]]) -> str:
-    """Convert 2D array to markdown table
 
-    Note: pdfplumber may extract tables with extra empty columns
-    due to PDF layout. Manual cleanup may be needed.
-    """
-    if not table_data:
-        return ""
-
-    # Clean None values and convert to strings
-    cleaned = []
-    for row in table_data:
-        cleaned_row = [str(cell).strip() if cell else "" for cell in row]
-        cleaned.append(cleaned_row)
-
-    if not cleaned:
-        return ""
-
-    # Remove fully empty columns
-    num_cols = max(len(row) for row in cleaned)
-    cols_to_keep = []
-    for col_idx in range(num_cols):
-        has_content = False
-        for row in cleaned:
-            if col_idx < len(row) and row[col_idx]:
-                has_content = True
-                break
-        if has_content:
-            cols_to_keep.append(col_idx)
-
-    # Filter rows to keep only non-empty columns
-    filtered = []
-    for row in cleaned:
-        filtered_row = [row[i] if i < len(row) else "" for i in cols_to_keep]
-        filtered.append(filtered_row)
-
-    if not filtered or not cols_to_keep:
-        return ""
-
-    # Build markdown table
-    lines = []
-
-    # Header row
-    header = filtered[0]
-    lines.append("| " + " | ".join(header) + " |")
-
-    # Separator
-    lines.append("| " + " | ".join(["---"] * len(header)) + " |")
-
-    # Data rows
-    for row in filtered[1:]:
-        # Pad row if shorter than header
-        while len(row) < len(header):
-            row.append("")
-        lines.append("| " + " | ".join(row[:len(header)]) + " |")
-
-    return "\n".join(lines)
+def find_section_tables(pdf_path: str, pdf_doc, page_indices: List[int],
+                        engine: str) -> Dict[int, List]:
+    """Extract the tables of the given pages with the chosen engine"""
+    with stage("tables"):
+        if engine == "pymupdf":
+            return extract_tables_pymupdf(pdf_doc, page_indices)
+        return extract_tables(pdf_path, page_indices)
 
 
 def process_section(pdf_doc, name: str, start_idx: int, end_idx: int,
-                    tables_by_page: Dict[int, List]) -> str:
-    """Extract and process a single section
+                    tables_by_page: Dict[int, List],
+                    page_parts: Optional[Dict[int, List[str]]] = None,
+                    low_memory: bool = False,
+                    ocr_texts: Optional[Dict[int, str]] = None) -> Iterator[str]:
+    """Extract and process a single section, yielding its content parts
+
+    The parts are joined with newlines when written; see interleave().
 
     Args:
         start_idx, end_idx: PDF page indices (0-based), NOT document page numbers
         tables_by_page: keyed by PDF page number (1-based index + 1)
+        page_parts: pages already processed by process_pages_parallel, keyed by index
+        low_memory: release PyMuPDF's caches after every page
+        ocr_texts: text of scanned pages, used instead of their text layer
     """
-    content_parts = []
-
     # Add section title as H1
-    content_parts.append(f"# {name}\n")
+    yield f"# {name}\n"
 
     # Extract text from page range
     for page_idx in range(start_idx, end_idx + 1):
-        # Add page marker for debugging (using PDF page number for clarity)
-        pdf_page_num = page_idx + 1
-        content_parts.append(f"\n<!-- PDF Page {pdf_page_num} -->\n")
-
-        # Extract text
-        page_text = pdf_doc[page_idx].get_text()
-        cleaned = clean_text(page_text)
-        converted = convert_headers(cleaned)
-        content_parts.append(converted)
-
-        # Add tables if present on this page
-        # pdfplumber uses 1-based page numbers
-        if pdf_page_num in tables_by_page:
-            for table in tables_by_page[pdf_page_num]:
-                md_table = table_to_markdown(table)
-                if md_table:
-                    content_parts.append(f"\n\n{md_table}\n")
-
-    return "\n".join(content_parts)
+        if page_parts is not None:
+            yield from page_parts[page_idx]
+        else:
+            yield from process_page(pdf_doc, page_idx, tables_by_page, ocr_texts)
+            if low_memory:
+                release_page_memory()
+
+
+def iter_page_parts(pdf_doc, page_idx: int, tables_by_page: Dict[int, List],
+                    ocr_texts: Optional[Dict[int, str]] = None) -> Iterator[str]:
+    """Yield the content parts (marker, text lines, tables) of one page"""
+    # Add page marker for debugging (using PDF page number for clarity)
+    pdf_page_num = page_idx + 1
+    yield f"\n<!-- PDF Page {pdf_page_num} -->\n"
+
+    # Extract text; each markdown line is its own part
+    if ocr_texts and page_idx in ocr_texts:
+        text = ocr_texts[page_idx]
+    else:
+        with stage("text"):
+            text = pdf_doc[page_idx].get_text()
+    yield from format_page_text(text, SPLIT_STYLE)
+
+    # Add tables if present on this page
+    # pdfplumber uses 1-based page numbers
+    if pdf_page_num in tables_by_page:
+        for table in tables_by_page[pdf_page_num]:
+            md_table = table_to_markdown(table)
+            if md_table:
+                yield f"\n\n{md_table}\n"
+
+
+def process_page(pdf_doc, page_idx: int, tables_by_page: Dict[int, List],
+                 ocr_texts: Optional[Dict[int, str]] = None) -> List[str]:
+    """Return the content parts (marker, text lines, tables) of one page"""
+    with stage("formatting"):
+        return list(iter_page_parts(pdf_doc, page_idx, tables_by_page, ocr_texts))
+
+
+def _process_page_run(pdf_path: str, page_indices: List[int], engine: str, low_memory: bool = False,
+                      ocr_texts: Optional[Dict[int, str]] = None) -> Dict[int, List[str]]:
+    """Pool worker: open the PDF separately and process a run of pages"""
+    pdf_doc = fitz.open(pdf_path)
+    try:
+        tables_by_page = find_section_tables(pdf_path, pdf_doc, page_indices, engine)
+        page_parts = {}
+        for page_idx in page_indices:
+            page_parts[page_idx] = process_page(pdf_doc, page_idx, tables_by_page, ocr_texts)
+            if low_memory:
+                release_page_memory()
+        return page_parts
+    finally:
+        pdf_doc.close()
+
+
+def process_pages_parallel(pdf_path: str, page_indices: List[int], jobs: int,
+                           engine: str = "pdfplumber", low_memory: bool = False,
+                           ocr_texts: Optional[Dict[int, str]] = None) -> Dict[int, List[str]]:
+    """Process pages in worker processes, return {page_idx: content parts}"""
+    # Several contiguous runs per worker, so uneven pages even out.
+    run_length = max(1, -(-len(page_indices) // (jobs * 4)))
+    runs = [page_indices[i:i + run_length] for i in range(0, len(page_indices), run_length)]
+    # Each run only needs the OCR text of its own pages
+    ocr_texts = ocr_texts or {}
+    run_ocr_texts = [{page_idx: ocr_texts[page_idx] for page_idx in run if page_idx in ocr_texts} for run in runs]
+
+    page_parts = {}
+    # spawn: MuPDF state must not be shared with a forked parent.
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("spawn")) as executor:
+        for run_parts in executor.map(
+            _process_page_run, [pdf_path] * len(runs), runs, [engine] * len(runs),
+            [low_memory] * len(runs), run_ocr_texts
+        ):
+            page_parts.update(run_parts)
+    return page_parts
 
 
 def get_filename_mapping() -> Dict[str, str]:
@@ -191,7 +250,8 @@ def get_filename_mapping() -> Dict[str, str]:
     }
 
 
-def main():
+def main(jobs: int = 1, table_engine: str = "pdfplumber", force: bool = False,
+         low_memory: bool = False, ocr: bool = True, ocr_jobs: int = 1):
     print("Starting PDF to Markdown conversion...")
 
     # 1. Open PDF
@@ -200,12 +260,7 @@ def main():
     total_pages = len(pdf_doc)
     print(f"Total pages: {total_pages}")
 
-    # 2. Extract tables
-    print("Extracting tables from all pages...")
-    tables_by_page = extract_tables(PDF_PATH)
-    print(f"Found tables on {len(tables_by_page)} pages")
-
-    # 3. Define major sections manually
+    # 2. Define major sections manually
     # Based on RPG rulebook structure
     # Note: Document page numbers in TOC are offset from PDF indices by +6
     # (e.g., document page 2 = PDF index 7)
@@ -223,12 +278,57 @@ def main():
         ("Mysteries", 77 + PAGE_OFFSET, 109 + PAGE_OFFSET, "09_Mysteries"),
         ("Bestiary", 110 + PAGE_OFFSET, min(132 + PAGE_OFFSET, 131), "10_Bestiary"),  # Cap at last page index
     ]
+    # Keep to the pages a shorter PDF has (e.g. bench_rulebook.py's synthetic ones)
+    major_sections = [
+        (name, start_idx, min(end_idx, total_pages - 1), file_base)
+        for name, start_idx, end_idx, file_base in major_sections
+        if start_idx < total_pages
+    ]
 
-    # 4. Process each section
+    # 3. Skip sections whose inputs match the build manifest
+    # Scans come out differently once Tesseract is installed
+    manifest = BuildManifest(OUTPUT_DIR, [__file__, rulebook_markdown.__file__, page_ocr.__file__],
+                             {"tableEngine": table_engine, "ocr": ocr and find_tesseract() is not None})
+    section_inputs = {}
+    stale_sections = []
+    skipped = []
+    for section in major_sections:
+        name, start_idx, end_idx, file_base = section
+        filename = f"{file_base}.md"
+        section_inputs[filename] = manifest.inputs(pdf_doc, range(start_idx, end_idx + 1), title=name)
+        if force or not manifest.is_current(filename, section_inputs[filename]):
+            stale_sections.append(section)
+        else:
+            skipped.append(filename)
+
+    # 4. Extract tables (and, with several jobs, the section pages themselves)
+    page_indices = sorted({
+        page_idx
+        for _, start_idx, end_idx, _ in stale_sections
+        for page_idx in range(start_idx, end_idx + 1)
+    })
+    ocr_texts = {}
+    if ocr:
+        with stage("ocr"):
+            found = ocr_pages(pdf_doc, page_indices, DEFAULT_OCR_CACHE_DIR, ocr_jobs)
+        # Pages Tesseract was not there to read keep their text layer
+        ocr_texts = {page_idx: text for page_idx, text in found.items() if text is not None}
+
+    tables_by_page = {}
+    page_parts = None
+    if jobs > 1:
+        print(f"Processing {len(page_indices)} pages with {jobs} worker processes...")
+        page_parts = process_pages_parallel(PDF_PATH, page_indices, jobs, table_engine, low_memory, ocr_texts)
+    else:
+        print(f"Extracting tables from {len(page_indices)} section pages with {table_engine}...")
+        tables_by_page = find_section_tables(PDF_PATH, pdf_doc, page_indices, table_engine)
+        print(f"Found tables on {len(tables_by_page)} pages")
+
+    # 5. Process each section
     print(f"\nCreating output directory: {OUTPUT_DIR}")
     Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
 
-    for name, start_idx, end_idx, file_base in major_sections:
+    for name, start_idx, end_idx, file_base in stale_sections:
         filename = f"{file_base}.md"
         output_path = os.path.join(OUTPUT_DIR, filename)
 
@@ -236,19 +336,30 @@ def main():
         print(f"  Output: {filename}")
 
         # Process section (using PDF indices, not document page numbers)
-        content = process_section(pdf_doc, name, start_idx, end_idx, tables_by_page)
+        parts = process_section(pdf_doc, name, start_idx, end_idx, tables_by_page, page_parts, low_memory,
+                                ocr_texts)
 
-        # 5. Write markdown file
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        # 6. Stream the markdown file page by page
+        with stage("write"):
+            write_markdown(output_path, interleave(parts))
+        manifest.record(filename, section_inputs[filename])
 
         file_size = os.path.getsize(output_path)
         print(f"  Written: {file_size} bytes")
 
+    manifest.save()
+    if skipped:
+        print(f"\nSkipped {len(skipped)} unchanged sections: {', '.join(skipped)}")
+
     pdf_doc.close()
     print("\n✓ Conversion complete!")
     print(f"Output files in: {OUTPUT_DIR}/")
 
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.memory_report:
+        pipeline_memory.start_report()
+    main(args.jobs, args.table_engine, args.force, args.low_memory, not args.no_ocr, args.ocr_jobs)
+    if args.memory_report:
+        print(pipeline_memory.finish_report())
@@ -5,58 +5,493 @@ Local Whisper runner for recorded WAV files.
 This script is called from the TypeScript WhisperTranscriber live layer through
 `uv run`. It intentionally supports uncompressed WAV input only so the current
 Docker devcontainer does not need ffmpeg.
+
+With `--serve` the model is loaded once and the script answers JSON-lines
+requests on stdin (`{"audioFile": "...", "id": ...}`) with one JSON-lines
+response per request on stdout, using the same `{"segments": [...]}` payload as
+the single-file mode (or `{"error": "..."}` when a request fails).
+
+With `--batch` the model is loaded once for a list of WAV files, directories of
+WAV files or fixture manifests (`{"fixtures": [{"file": ...}]}`), and one
+JSON line per file (`{"audioFile": ..., "segments": [...]}` or
+`{"audioFile": ..., "error": ...}`) is streamed as each file finishes.
+`--jobs N` spreads a batch over N worker processes, each loading the model once
+and running `--threads-per-job` torch threads; results still come back in input
+order, and a throughput summary is printed on stderr.
+
+With `--stream` raw little-endian 16-bit PCM (`--sample-rate`, `--channels`)
+is read from stdin as it is recorded, and JSON-lines events are written as the
+rolling buffer is re-decoded every `--stream-step-seconds` (see live_stream.py):
+`{"type": "ready"}` once the model is loaded, `{"type": "partial", ...}` for the
+current unconfirmed hypothesis and `{"type": "segment", ...}` for committed
+segments, both with `text`, `startMs` and `endMs` relative to the start of the
+stream, and `{"type": "end", "audioMs": ...}` after stdin closes.
+
+With `--window-seconds` a single long recording is read and transcribed in
+overlapping fixed-size windows, so peak memory does not grow with the length of
+the recording. Each window prints one `{"segments": [...]}` line holding the
+segments it produced, with absolute timestamps and window-edge duplicates
+removed.
+
+Whole-file results are kept in a content-addressed on-disk cache (see
+whisper_cache.py), so re-transcribing an unchanged WAV with the same options
+returns without importing torch or loading the model. `--no-cache` bypasses it
+and `--clear-cache` empties it.
+
+With `--vad` an energy/zero-crossing voice activity pre-pass (see
+voice_activity.py) drops silence before inference; only speech regions reach
+the model and segment timestamps are mapped back onto the original timeline.
+How much audio was skipped is reported on stderr.
+
+With `--quantize int8` the model's linear layers are converted to dynamically
+quantized int8 kernels after loading, which makes CPU inference faster and
+smaller at a small cost in accuracy (see scripts/compare_quantized.py). The
+quantized state dict is saved under `models/` in the cache directory, so later
+starts rebuild the module from it instead of reading the fp32 checkpoint; it
+is loaded with `weights_only=True`, so the file holds tensors and never code.
+
+With `--timings` every whole-file response also carries a `timings` object:
+wall-clock milliseconds per stage (startup, cacheLookup, decode, resample,
+loadModel, transcribe), the audio duration, the real-time factor and the peak
+RSS of the process. `--profile-output PATH` writes a cProfile/pstats dump of
+the run for deeper analysis.
 """
 
 from __future__ import annotations
 
 import argparse
+import cProfile
 import json
+import multiprocessing
+import os
+import queue
+import struct
 import sys
-import wave
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
 from pathlib import Path
 
 import numpy as np
-import whisper
+
+from audio_resample import PolyphaseResampler, output_length, resample
+from live_stream import DEFAULT_STEP_SECONDS, StreamingDecoder, pcm16_to_mono
+from voice_activity import compact_speech
+from whisper_cache import (
+    DEFAULT_CACHE_MAX_BYTES,
+    TranscriptionCache,
+    cache_key,
+    default_cache_dir,
+)
 
 
 TARGET_SAMPLE_RATE = 16_000
+DEFAULT_WINDOW_OVERLAP_SECONDS = 2.0
+DECODE_BLOCK_FRAMES = 1 << 16
+STREAM_READ_BYTES = 1 << 14
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+DECODE_OPTIONS = {"fp16": False, "temperature": 0}
+# Bump when decoding or resampling changes so cached transcripts are not reused.
+PIPELINE_VERSION = 2
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser()
-    parser.add_argument("--audio-file", required=True)
-    parser.add_argument("--model", required=True)
-    parser.add_argument("--language", required=True)
-    return parser.parse_args()
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--audio-file")
+    mode.add_argument(
+        "--serve",
+        action="store_true",
+        help="keep the model loaded and answer JSON-lines requests on stdin",
+    )
+    mode.add_argument(
+        "--batch",
+        nargs="+",
+        metavar="PATH",
+        help="WAV files, directories of WAV files or fixture manifest JSON files",
+    )
+    mode.add_argument(
+        "--stream",
+        action="store_true",
+        help="transcribe raw 16-bit PCM from stdin and emit partial and committed segments",
+    )
+    parser.add_argument("--model")
+    parser.add_argument("--language")
+    parser.add_argument(
+        "--window-seconds",
+        type=float,
+        help="transcribe --audio-file in windows of this length to bound memory use",
+    )
+    parser.add_argument(
+        "--window-overlap-seconds",
+        type=float,
+        default=DEFAULT_WINDOW_OVERLAP_SECONDS,
+        help="audio shared by consecutive windows (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--sample-rate",
+        type=int,
+        default=TARGET_SAMPLE_RATE,
+        help="sample rate of the --stream PCM input (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--channels",
+        type=int,
+        default=1,
+        help="interleaved channels in the --stream PCM input (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--stream-step-seconds",
+        type=float,
+        default=DEFAULT_STEP_SECONDS,
+        help="new audio between two decodes of the --stream buffer (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        help="worker processes for --batch (default: chosen from the CPU count)",
+    )
+    parser.add_argument(
+        "--threads-per-job",
+        type=int,
+        help="torch intra-op threads per worker (default: chosen from the CPU count)",
+    )
+    parser.add_argument(
+        "--vad",
+        action="store_true",
+        help="skip non-speech audio with a voice activity pre-pass before inference",
+    )
+    parser.add_argument(
+        "--quantize",
+        choices=["int8"],
+        help="run the model's linear layers with dynamic int8 quantization",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="add per-stage wall-clock timings and peak RSS to each JSON response",
+    )
+    parser.add_argument(
+        "--profile-output",
+        type=Path,
+        help="write a cProfile/pstats dump of this run to the given path",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=None,
+        help="transcript cache directory (default: $WHISPER_CACHE_DIR or ~/.cache/ruleflow-whisper)",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=DEFAULT_CACHE_MAX_BYTES / (1024 * 1024),
+        help="evict least recently used cache entries above this size (default: %(default)s)",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="neither read nor write the cache")
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="remove all cached transcripts before doing anything else",
+    )
+    args = parser.parse_args()
+
+    has_mode = bool(args.audio_file or args.serve or args.batch or args.stream)
+    if not has_mode and not args.clear_cache:
+        parser.error("one of --audio-file, --serve, --batch, --stream or --clear-cache is required")
+    if has_mode and (not args.model or not args.language):
+        parser.error("--model and --language are required")
+
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.threads_per_job is not None and args.threads_per_job < 1:
+        parser.error("--threads-per-job must be at least 1")
+
+    if args.stream:
+        if args.vad or args.timings:
+            parser.error("--vad and --timings are not supported with --stream")
+        if args.sample_rate <= 0 or args.channels <= 0:
+            parser.error("--sample-rate and --channels must be positive")
+        if args.stream_step_seconds <= 0:
+            parser.error("--stream-step-seconds must be positive")
+
+    if args.window_seconds is not None:
+        if not args.audio_file:
+            parser.error("--window-seconds requires --audio-file")
+        if args.timings:
+            parser.error("--timings is not supported with --window-seconds")
+        if args.window_seconds <= 0:
+            parser.error("--window-seconds must be positive")
+        if not 0 <= args.window_overlap_seconds < args.window_seconds:
+            parser.error("--window-overlap-seconds must be in [0, --window-seconds)")
+
+    return args
+
+
+class StageTimings:
+    """Accumulates wall-clock time per named pipeline stage."""
+
+    def __init__(self) -> None:
+        self.stages_ms: dict[str, float] = {}
+
+    def add(self, stage: str, elapsed_ms: float) -> None:
+        self.stages_ms[stage] = self.stages_ms.get(stage, 0.0) + elapsed_ms
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, (time.perf_counter() - started) * 1000)
+
+    def report(self, audio_duration_ms: int) -> dict:
+        total_ms = sum(elapsed for stage, elapsed in self.stages_ms.items() if stage != "startup")
+        return {
+            **{f"{stage}Ms": round(elapsed, 1) for stage, elapsed in self.stages_ms.items()},
+            "totalMs": round(total_ms, 1),
+            "audioDurationMs": audio_duration_ms,
+            "realTimeFactor": round(total_ms / audio_duration_ms, 4) if audio_duration_ms else None,
+            "peakRssMb": peak_rss_mb(),
+        }
+
+
+def peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux but in bytes on macOS.
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
 
 
-def read_wav_audio(path: Path) -> np.ndarray:
+def process_age_ms() -> float | None:
+    """Milliseconds since this process started (Linux only), covering interpreter startup."""
+    try:
+        stat_fields = Path("/proc/self/stat").read_text().rsplit(")", 1)[1].split()
+        uptime_seconds = float(Path("/proc/uptime").read_text().split()[0])
+        ticks_per_second = os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+    started_seconds = int(stat_fields[19]) / ticks_per_second
+    return max(0.0, (uptime_seconds - started_seconds) * 1000)
+
+
+@dataclass(frozen=True)
+class WavLayout:
+    sample_rate: int
+    channel_count: int
+    sample_width: int
+    data_offset: int
+    frame_count: int
+
+    @property
+    def duration_ms(self) -> int:
+        return int(round(self.frame_count * 1000 / self.sample_rate)) if self.sample_rate else 0
+
+
+def read_wav_layout(path: Path) -> WavLayout:
+    """Locate the `fmt ` and `data` chunks of an uncompressed PCM WAV file."""
     if path.suffix.lower() != ".wav":
         raise ValueError(
             f"WhisperTranscriber currently supports .wav files only in the devcontainer: {path}"
         )
 
-    with wave.open(str(path), "rb") as wav_file:
-        if wav_file.getcomptype() != "NONE":
-            raise ValueError(f"Compressed WAV is not supported: {path}")
+    file_size = path.stat().st_size
+    with path.open("rb") as wav_file:
+        riff_header = wav_file.read(12)
+        if len(riff_header) < 12 or riff_header[:4] != b"RIFF" or riff_header[8:12] != b"WAVE":
+            raise ValueError(f"Not a RIFF/WAVE file: {path}")
+
+        fmt = None
+        while True:
+            chunk_header = wav_file.read(8)
+            if len(chunk_header) < 8:
+                raise ValueError(f"WAV file has no data chunk: {path}")
+
+            chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+            if chunk_id == b"fmt ":
+                fmt = wav_file.read(chunk_size)
+                if chunk_size % 2:
+                    wav_file.seek(1, os.SEEK_CUR)
+            elif chunk_id == b"data":
+                data_offset = wav_file.tell()
+                data_size = min(chunk_size, file_size - data_offset)
+                break
+            else:
+                wav_file.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+    if fmt is None or len(fmt) < 16:
+        raise ValueError(f"WAV file has no fmt chunk before its data: {path}")
+
+    format_tag, channel_count, sample_rate, _, block_align, bits_per_sample = struct.unpack(
+        "<HHIIHH", fmt[:16]
+    )
+    if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+        format_tag = struct.unpack("<H", fmt[24:26])[0]
+    if format_tag != WAVE_FORMAT_PCM:
+        raise ValueError(f"Compressed WAV is not supported: {path}")
+
+    sample_width = (bits_per_sample + 7) // 8
+    dtype_for_sample_width(sample_width)
+    if channel_count < 1 or block_align != sample_width * channel_count:
+        raise ValueError(f"Malformed WAV fmt chunk: {path}")
+
+    return WavLayout(
+        sample_rate=sample_rate,
+        channel_count=channel_count,
+        sample_width=sample_width,
+        data_offset=data_offset,
+        frame_count=data_size // block_align,
+    )
+
+
+def map_pcm_frames(path: Path, layout: WavLayout) -> np.ndarray:
+    """Memory-map the PCM data as a `(frames, channels)` array without reading it."""
+    dtype = dtype_for_sample_width(layout.sample_width)
+    if layout.frame_count == 0:
+        return np.empty((0, layout.channel_count), dtype=dtype)
+
+    return np.memmap(
+        path,
+        dtype=dtype,
+        mode="r",
+        offset=layout.data_offset,
+        shape=(layout.frame_count, layout.channel_count),
+    )
+
+
+def read_wav_audio(path: Path, timings: StageTimings | None = None) -> np.ndarray:
+    """Decode a WAV file to mono float32 at TARGET_SAMPLE_RATE.
+
+    The PCM data is memory-mapped and decoded block by block, downmixed and
+    normalized straight into the one output array. 16 kHz input skips the
+    resampler entirely.
+    """
+    timings = timings or StageTimings()
+    layout = read_wav_layout(path)
+    frames = map_pcm_frames(path, layout)
+
+    if layout.sample_rate == TARGET_SAMPLE_RATE:
+        audio = np.empty(layout.frame_count, dtype=np.float32)
+        with timings.stage("decode"):
+            for start in range(0, layout.frame_count, DECODE_BLOCK_FRAMES):
+                block = frames[start : start + DECODE_BLOCK_FRAMES]
+                decode_frames_into(
+                    block, layout.sample_width, audio[start : start + block.shape[0]]
+                )
+        return audio
+
+    resampler = PolyphaseResampler(layout.sample_rate, TARGET_SAMPLE_RATE)
+    audio = np.empty(
+        output_length(layout.frame_count, resampler.up, resampler.down), dtype=np.float32
+    )
+    scratch = np.empty(min(DECODE_BLOCK_FRAMES, layout.frame_count), dtype=np.float32)
+    filled = 0
+    for start in range(0, layout.frame_count, DECODE_BLOCK_FRAMES):
+        block = frames[start : start + DECODE_BLOCK_FRAMES]
+        with timings.stage("decode"):
+            decoded = decode_frames_into(block, layout.sample_width, scratch[: block.shape[0]])
+        with timings.stage("resample"):
+            resampled = resampler.process(decoded)
+        audio[filled : filled + resampled.size] = resampled
+        filled += resampled.size
+
+    with timings.stage("resample"):
+        tail = resampler.flush()
+    audio[filled : filled + tail.size] = tail
+    return audio
+
+
+def iter_wav_windows(
+    path: Path, window_seconds: float, overlap_seconds: float
+) -> Iterator[tuple[int, np.ndarray, bool]]:
+    """Yield `(start_ms, audio, is_last)` for overlapping windows of a WAV file.
 
-        sample_width = wav_file.getsampwidth()
-        sample_rate = wav_file.getframerate()
-        channel_count = wav_file.getnchannels()
-        frame_count = wav_file.getnframes()
-        pcm_bytes = wav_file.readframes(frame_count)
+    The file is decoded and resampled in a single streaming pass, so only about
+    one window of audio is held in memory at a time; `audio` is mono float32 at
+    TARGET_SAMPLE_RATE like `read_wav_audio` returns.
+    """
+    layout = read_wav_layout(path)
+    frames = map_pcm_frames(path, layout)
 
-    dtype = dtype_for_sample_width(sample_width)
-    audio = np.frombuffer(pcm_bytes, dtype=dtype)
+    resampler = None
+    if layout.sample_rate != TARGET_SAMPLE_RATE:
+        resampler = PolyphaseResampler(layout.sample_rate, TARGET_SAMPLE_RATE)
 
-    if channel_count > 1:
-        audio = audio.reshape(-1, channel_count).mean(axis=1)
+    window_size = max(1, int(round(window_seconds * TARGET_SAMPLE_RATE)))
+    overlap_size = min(window_size - 1, int(round(overlap_seconds * TARGET_SAMPLE_RATE)))
+    read_frames = max(1, int(round(window_seconds * layout.sample_rate)))
 
-    audio = normalize_audio(audio, sample_width)
-    if sample_rate != TARGET_SAMPLE_RATE:
-        audio = resample_audio(audio, sample_rate, TARGET_SAMPLE_RATE)
+    window_start = 0
+    read_position = 0
+    pending = np.empty(0, dtype=np.float32)
+    exhausted = layout.frame_count == 0
+    while True:
+        while pending.size <= window_size and not exhausted:
+            block = frames[read_position : read_position + read_frames]
+            fresh = decode_frames_into(
+                block, layout.sample_width, np.empty(block.shape[0], dtype=np.float32)
+            )
+            read_position += block.shape[0]
+            exhausted = read_position >= layout.frame_count
+            if resampler is not None:
+                fresh = resampler.process(fresh)
+                if exhausted:
+                    fresh = np.concatenate((fresh, resampler.flush()))
+            pending = np.concatenate((pending, fresh))
 
-    return audio.astype(np.float32)
+        is_last = exhausted and pending.size <= window_size
+        start_ms = int(round(window_start * 1000 / TARGET_SAMPLE_RATE))
+        yield start_ms, pending[:window_size], is_last
+
+        if is_last:
+            return
+
+        step = window_size - overlap_size
+        pending = pending[step:]
+        window_start += step
+
+
+def decode_frames_into(frames: np.ndarray, sample_width: int, out: np.ndarray) -> np.ndarray:
+    """Downmix and normalize `(frames, channels)` PCM samples into float32 `out`."""
+    if sample_width == 3:
+        frames = widen_24_bit(frames)
+
+    channel_count = frames.shape[1]
+    scale = np.float32(1.0 / (2 ** (sample_width * 8 - 1) * channel_count))
+
+    if channel_count == 1:
+        np.multiply(frames[:, 0], scale, out=out, casting="unsafe")
+    else:
+        # A per-channel add is several times faster than np.sum(axis=1) on interleaved PCM.
+        np.copyto(out, frames[:, 0], casting="unsafe")
+        for channel in range(1, channel_count):
+            np.add(out, frames[:, channel], out=out, casting="unsafe")
+        np.multiply(out, scale, out=out)
+
+    if sample_width == 1:
+        # 8-bit WAV is unsigned with silence at 128.
+        np.subtract(out, np.float32(1.0), out=out)
+
+    return out
+
+
+def widen_24_bit(frames: np.ndarray) -> np.ndarray:
+    """Sign-extend `(frames, channels, 3)` little-endian bytes to int32 samples."""
+    samples = frames[..., 0].astype(np.int32)
+    samples |= frames[..., 1].astype(np.int32) << 8
+    samples |= frames[..., 2].astype(np.int8).astype(np.int32) << 16
+    return samples
 
 
 def dtype_for_sample_width(sample_width: int) -> np.dtype:
@@ -64,42 +499,127 @@ def dtype_for_sample_width(sample_width: int) -> np.dtype:
         case 1:
             return np.dtype(np.uint8)
         case 2:
-            return np.dtype(np.int16)
+            return np.dtype("<i2")
+        case 3:
+            # Three little-endian bytes per sample; see widen_24_bit.
+            return np.dtype((np.uint8, (3,)))
         case 4:
-            return np.dtype(np.int32)
+            return np.dtype("<i4")
         case _:
             raise ValueError(f"Unsupported WAV sample width: {sample_width} bytes")
 
 
-def normalize_audio(audio: np.ndarray, sample_width: int) -> np.ndarray:
-    if sample_width == 1:
-        return (audio.astype(np.float32) - 128.0) / 128.0
-
-    max_magnitude = float(2 ** (sample_width * 8 - 1))
-    return audio.astype(np.float32) / max_magnitude
-
-
 def resample_audio(audio: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
     if audio.size == 0:
         return audio.astype(np.float32)
 
-    duration_seconds = audio.size / float(source_rate)
-    target_size = max(1, int(round(duration_seconds * target_rate)))
-    source_positions = np.linspace(0.0, duration_seconds, num=audio.size, endpoint=False)
-    target_positions = np.linspace(0.0, duration_seconds, num=target_size, endpoint=False)
-    return np.interp(target_positions, source_positions, audio).astype(np.float32)
+    return resample(audio, source_rate, target_rate)
 
 
-def main() -> int:
-    args = parse_args()
-    audio_path = Path(args.audio_file)
+def load_whisper_model(
+    model_name: str,
+    threads: int | None = None,
+    quantize: str | None = None,
+    model_cache_dir: Path | None = None,
+):
+    # Imported lazily: importing whisper pulls in torch, which dominates startup.
+    import whisper
 
-    if not audio_path.exists():
-        raise FileNotFoundError(f"Audio file not found: {audio_path}")
+    if threads is not None:
+        import torch
+
+        torch.set_num_threads(threads)
+
+    if quantize is None:
+        return whisper.load_model(model_name)
+    return load_quantized_model(model_name, model_cache_dir or default_cache_dir() / "models")
+
+
+def load_quantized_model(model_name: str, model_cache_dir: Path):
+    import torch
+    import whisper
 
-    audio = read_wav_audio(audio_path)
-    model = whisper.load_model(args.model)
-    result = model.transcribe(audio, language=args.language, fp16=False, temperature=0)
+    # Packed int8 weights are only known to load into the torch that wrote them.
+    cached_path = model_cache_dir / f"{model_name}-int8-torch{torch.__version__}.state.pt".replace("+", "_")
+    if cached_path.exists():
+        try:
+            cached = torch.load(cached_path, map_location="cpu", weights_only=True)
+            dims = whisper.model.ModelDimensions(**cached["dims"])
+            model = quantize_linear_layers(whisper.model.Whisper(dims))
+            model.load_state_dict(cached["state_dict"])
+            # Not part of the state dict; load_model() sets them for the named models
+            alignment_heads = whisper._ALIGNMENT_HEADS.get(model_name)
+            if alignment_heads is not None:
+                model.set_alignment_heads(alignment_heads)
+            return model
+        except Exception as exc:  # a damaged or outdated file is rebuilt below
+            print(f"Ignoring unreadable quantized model {cached_path}: {exc}", file=sys.stderr)
+
+    model = quantize_linear_layers(whisper.load_model(model_name, device="cpu"))
+
+    model_cache_dir.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=model_cache_dir, prefix=".tmp-", suffix=".pt")
+    os.close(fd)
+    try:
+        torch.save({"dims": asdict(model.dims), "state_dict": model.state_dict()}, temp_name)
+        os.replace(temp_name, cached_path)
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+    return model
+
+
+def quantize_linear_layers(model):
+    import torch
+
+    for module in model.modules():
+        # whisper.model.Linear only adds a dtype cast to forward(); quantize_dynamic
+        # matches module types exactly, so hand it plain nn.Linear layers.
+        if isinstance(module, torch.nn.Linear):
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def default_worker_split(cpu_count: int) -> tuple[int, int]:
+    """Split cores into `(jobs, threads_per_job)`.
+
+    Whisper's CPU inference stops scaling at a few intra-op threads, so the
+    cores are shared out as several 4-thread workers rather than one wide one.
+    """
+    threads = max(1, min(4, cpu_count))
+    return max(1, cpu_count // threads), threads
+
+
+def transcribe_audio(model, audio: np.ndarray, language: str, vad: bool = False) -> list[dict]:
+    if not vad:
+        return run_whisper(model, audio, language)
+
+    speech = compact_speech(audio, TARGET_SAMPLE_RATE)
+    skipped_percent = 100 * speech.skipped_ms / speech.original_ms if speech.original_ms else 0.0
+    print(
+        f"vad: skipped {speech.skipped_ms / 1000:.1f}s of {speech.original_ms / 1000:.1f}s"
+        f" ({skipped_percent:.0f}%)",
+        file=sys.stderr,
+    )
+    if speech.audio.size == 0:
+        return []
+
+    return [
+        {
+            "text": segment["text"],
+            "startMs": speech.speech_map.to_original_ms(segment["startMs"]),
+            "endMs": speech.speech_map.to_original_ms(segment["endMs"], is_end=True),
+        }
+        for segment in run_whisper(model, speech.audio, language)
+    ]
+
+
+def run_whisper(
+    model, audio: np.ndarray, language: str, initial_prompt: str | None = None
+) -> list[dict]:
+    result = model.transcribe(
+        audio, language=language, initial_prompt=initial_prompt, **DECODE_OPTIONS
+    )
 
     segments = []
     for segment in result.get("segments", []):
@@ -115,7 +635,418 @@ def main() -> int:
             }
         )
 
-    print(json.dumps({"segments": segments}))
+    return segments
+
+
+class Transcriber:
+    """Owns the Whisper model, loaded on first use, and the optional result cache."""
+
+    def __init__(
+        self,
+        model_name: str,
+        cache: TranscriptionCache | None = None,
+        vad: bool = False,
+        threads: int | None = None,
+        timings: bool = False,
+        quantize: str | None = None,
+        model_cache_dir: Path | None = None,
+    ) -> None:
+        self.model_name = model_name
+        self.cache = cache
+        self.vad = vad
+        self.threads = threads
+        self.timings = timings
+        self.quantize = quantize
+        self.model_cache_dir = model_cache_dir
+        # Reported once, on the first response of the process.
+        self.startup_ms = process_age_ms() if timings else None
+        self._model = None
+
+    def __getstate__(self) -> dict:
+        # Pool workers receive the configuration and load their own model.
+        return {**self.__dict__, "_model": None, "startup_ms": None}
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = load_whisper_model(
+                self.model_name, self.threads, self.quantize, self.model_cache_dir
+            )
+        return self._model
+
+    def cache_options(self, language: str) -> dict:
+        return {
+            "model": self.model_name,
+            "language": language,
+            "decode": DECODE_OPTIONS,
+            "pipeline": PIPELINE_VERSION,
+            "vad": self.vad,
+            "quantize": self.quantize,
+        }
+
+    def transcribe_file(self, audio_path: Path, language: str) -> dict:
+        if not audio_path.exists():
+            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+
+        timings = StageTimings()
+        if self.startup_ms is not None:
+            timings.add("startup", self.startup_ms)
+            self.startup_ms = None
+
+        key = None
+        response = None
+        if self.cache is not None:
+            with timings.stage("cacheLookup"):
+                key = cache_key(audio_path, self.cache_options(language))
+                response = self.cache.get(key)
+
+        if response is None:
+            audio = read_wav_audio(audio_path, timings)
+            if self._model is None:
+                with timings.stage("loadModel"):
+                    self.model
+            with timings.stage("transcribe"):
+                response = {"segments": transcribe_audio(self.model, audio, language, self.vad)}
+
+            if self.cache is not None and key is not None:
+                self.cache.put(key, response)
+
+        if self.timings:
+            response = {**response, "timings": timings.report(wav_duration_ms(audio_path))}
+        return response
+
+
+class WindowSegmentMerger:
+    """Turns per-window segments into one absolute, duplicate-free timeline.
+
+    A segment is left to the next window when it starts in the second half of
+    the overlap, and dropped when its midpoint falls inside audio that earlier
+    windows already committed.
+    """
+
+    def __init__(self) -> None:
+        self.committed_end_ms = 0
+        self.last_text: str | None = None
+
+    def add(self, segments: list[dict], offset_ms: int, boundary_ms: int | None) -> list[dict]:
+        emitted = []
+        for segment in segments:
+            start_ms = segment["startMs"] + offset_ms
+            end_ms = segment["endMs"] + offset_ms
+            if boundary_ms is not None and start_ms >= boundary_ms:
+                continue
+            if (start_ms + end_ms) / 2 < self.committed_end_ms:
+                continue
+            if segment["text"] == self.last_text and start_ms < self.committed_end_ms:
+                continue
+
+            emitted.append({"text": segment["text"], "startMs": start_ms, "endMs": end_ms})
+            self.committed_end_ms = max(self.committed_end_ms, end_ms)
+            self.last_text = segment["text"]
+
+        return emitted
+
+
+def transcribe_windowed(
+    transcriber: Transcriber, audio_path: Path, language: str, window_seconds: float, overlap_seconds: float
+) -> int:
+    if not audio_path.exists():
+        raise FileNotFoundError(f"Audio file not found: {audio_path}")
+
+    merger = WindowSegmentMerger()
+    step_ms = int(round((window_seconds - overlap_seconds) * 1000))
+    half_overlap_ms = int(round(overlap_seconds * 500))
+
+    for start_ms, audio, is_last in iter_wav_windows(audio_path, window_seconds, overlap_seconds):
+        boundary_ms = None if is_last else start_ms + step_ms + half_overlap_ms
+        segments = merger.add(
+            transcribe_audio(transcriber.model, audio, language, transcriber.vad),
+            start_ms,
+            boundary_ms,
+        )
+        if segments:
+            sys.stdout.write(json.dumps({"segments": segments}) + "\n")
+            sys.stdout.flush()
+
+    return 0
+
+
+def handle_request(transcriber: Transcriber, line: str, default_language: str) -> dict:
+    request_id = None
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("Request must be a JSON object")
+
+        request_id = request.get("id")
+        audio_file = request.get("audioFile")
+        if not isinstance(audio_file, str) or not audio_file:
+            raise ValueError("Request is missing a non-empty 'audioFile'")
+
+        language = request.get("language") or default_language
+        response = transcriber.transcribe_file(Path(audio_file), language)
+    except Exception as exc:  # reported per request so the worker keeps serving
+        response = {"error": str(exc) or exc.__class__.__name__}
+
+    if request_id is not None:
+        response["id"] = request_id
+    return response
+
+
+def serve(transcriber: Transcriber, language: str) -> int:
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+
+        response = handle_request(transcriber, line, language)
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+
+    return 0
+
+
+def read_stdin_chunks(chunks: queue.Queue) -> None:
+    # Runs on a thread so stdin keeps draining while a decode is in progress.
+    stdin = sys.stdin.buffer
+    while chunk := stdin.read1(STREAM_READ_BYTES):
+        chunks.put(chunk)
+    chunks.put(None)
+
+
+def stream(
+    transcriber: Transcriber,
+    language: str,
+    sample_rate: int,
+    channel_count: int,
+    step_seconds: float,
+) -> int:
+    model = transcriber.model
+    decoder = StreamingDecoder(
+        lambda audio, prompt: run_whisper(model, audio, language, prompt), step_seconds
+    )
+    resampler = (
+        PolyphaseResampler(sample_rate, TARGET_SAMPLE_RATE)
+        if sample_rate != TARGET_SAMPLE_RATE
+        else None
+    )
+    frame_bytes = 2 * channel_count
+
+    def emit(events: list[dict]) -> None:
+        for event in events:
+            sys.stdout.write(json.dumps(event) + "\n")
+        sys.stdout.flush()
+
+    chunks: queue.Queue[bytes | None] = queue.Queue()
+    threading.Thread(target=read_stdin_chunks, args=(chunks,), daemon=True).start()
+    emit([{"type": "ready"}])
+
+    pending = b""
+    finished = False
+    while not finished:
+        # Take everything that arrived during the previous decode in one go.
+        received = [chunks.get()]
+        while not chunks.empty():
+            received.append(chunks.get_nowait())
+        finished = received[-1] is None
+
+        pending += b"".join(chunk for chunk in received if chunk)
+        whole = len(pending) - len(pending) % frame_bytes
+        audio = pcm16_to_mono(pending[:whole], channel_count)
+        pending = pending[whole:]
+
+        if resampler is not None:
+            audio = resampler.process(audio)
+            if finished:
+                audio = np.concatenate((audio, resampler.flush()))
+        decoder.append(audio)
+
+        if decoder.due and not finished:
+            emit(decoder.step())
+
+    emit(decoder.finish())
+    emit([{"type": "end", "audioMs": decoder.received_ms}])
+    return 0
+
+
+def collect_batch_files(paths: list[str]) -> list[Path]:
+    audio_paths: list[Path] = []
+
+    for raw_path in paths:
+        path = Path(raw_path)
+        if path.is_dir():
+            audio_paths.extend(
+                sorted(child for child in path.iterdir() if child.suffix.lower() == ".wav")
+            )
+        elif path.suffix.lower() == ".json":
+            audio_paths.extend(read_manifest_files(path))
+        else:
+            audio_paths.append(path)
+
+    return audio_paths
+
+
+def read_manifest_files(manifest_path: Path) -> list[Path]:
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    fixtures = manifest.get("fixtures") if isinstance(manifest, dict) else None
+    if not isinstance(fixtures, list):
+        raise ValueError(f"Manifest has no 'fixtures' list: {manifest_path}")
+
+    return [manifest_path.parent / str(fixture["file"]) for fixture in fixtures]
+
+
+def transcribe_batch_item(
+    transcriber: Transcriber, audio_path: Path, language: str
+) -> tuple[dict, int]:
+    try:
+        response = transcriber.transcribe_file(audio_path, language)
+    except Exception as exc:  # reported per file so one bad WAV does not abort the batch
+        response = {"error": str(exc) or exc.__class__.__name__}
+
+    return {"audioFile": str(audio_path), **response}, wav_duration_ms(audio_path)
+
+
+def wav_duration_ms(audio_path: Path) -> int:
+    try:
+        return read_wav_layout(audio_path).duration_ms
+    except (OSError, ValueError):
+        return 0
+
+
+_worker_transcriber: Transcriber | None = None
+
+
+def _init_pool_worker(transcriber: Transcriber) -> None:
+    global _worker_transcriber
+    _worker_transcriber = transcriber
+
+
+def _transcribe_in_worker(audio_path: Path, language: str) -> tuple[dict, int]:
+    assert _worker_transcriber is not None, "pool worker was not initialized"
+    return transcribe_batch_item(_worker_transcriber, audio_path, language)
+
+
+def run_batch(
+    transcriber: Transcriber, audio_paths: list[Path], language: str, jobs: int = 1
+) -> int:
+    failures = 0
+    audio_ms = 0
+    started = time.perf_counter()
+
+    if jobs > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=jobs,
+            # spawn: workers must not inherit a half-initialized torch from a fork.
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_pool_worker,
+            initargs=(transcriber,),
+        )
+        results = executor.map(
+            _transcribe_in_worker, audio_paths, [language] * len(audio_paths)
+        )
+    else:
+        executor = None
+        results = (transcribe_batch_item(transcriber, path, language) for path in audio_paths)
+
+    try:
+        for line, duration_ms in results:
+            failures += "error" in line
+            audio_ms += duration_ms
+            sys.stdout.write(json.dumps(line) + "\n")
+            sys.stdout.flush()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - started
+    print_throughput(len(audio_paths), audio_ms, elapsed, jobs, transcriber.threads)
+    return 1 if failures else 0
+
+
+def print_throughput(
+    file_count: int, audio_ms: int, elapsed: float, jobs: int, threads: int | None
+) -> None:
+    files_per_second = file_count / elapsed if elapsed > 0 else 0.0
+    real_time_factor = elapsed * 1000 / audio_ms if audio_ms else 0.0
+    print(
+        f"batch: {file_count} files, {audio_ms / 1000:.1f}s audio in {elapsed:.1f}s"
+        f" ({files_per_second:.2f} files/s, real-time factor {real_time_factor:.3f})"
+        f" with {jobs} job(s) x {threads or 'default'} thread(s)",
+        file=sys.stderr,
+    )
+
+
+def main() -> int:
+    args = parse_args()
+    if args.profile_output is None:
+        return run(args)
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return run(args)
+    finally:
+        profiler.disable()
+        profiler.dump_stats(args.profile_output)
+        print(f"Wrote profile to {args.profile_output}", file=sys.stderr)
+
+
+def run(args: argparse.Namespace) -> int:
+    cache = None
+    if not args.no_cache or args.clear_cache:
+        cache = TranscriptionCache(
+            args.cache_dir or default_cache_dir(), int(args.cache_max_mb * 1024 * 1024)
+        )
+    if args.clear_cache:
+        removed = cache.clear()
+        print(f"Removed {removed} cached transcripts from {cache.directory}", file=sys.stderr)
+        if args.no_cache:
+            cache = None
+    if not (args.audio_file or args.serve or args.batch or args.stream):
+        return 0
+
+    jobs, threads = 1, args.threads_per_job
+    if args.batch:
+        default_jobs, default_threads = default_worker_split(os.cpu_count() or 1)
+        jobs = args.jobs or default_jobs
+        if threads is None and jobs > 1:
+            threads = default_threads
+
+    transcriber = Transcriber(
+        args.model,
+        cache,
+        args.vad,
+        threads,
+        args.timings,
+        args.quantize,
+        (args.cache_dir or default_cache_dir()) / "models",
+    )
+
+    if args.serve:
+        return serve(transcriber, args.language)
+
+    if args.stream:
+        return stream(
+            transcriber, args.language, args.sample_rate, args.channels, args.stream_step_seconds
+        )
+
+    if args.batch:
+        audio_paths = collect_batch_files(args.batch)
+        if not audio_paths:
+            raise FileNotFoundError(f"No WAV files found in: {' '.join(args.batch)}")
+        return run_batch(transcriber, audio_paths, args.language, min(jobs, len(audio_paths)))
+
+    audio_path = Path(args.audio_file)
+
+    if args.window_seconds is not None:
+        return transcribe_windowed(
+            transcriber,
+            audio_path,
+            args.language,
+            args.window_seconds,
+            args.window_overlap_seconds,
+        )
+
+    print(json.dumps(transcriber.transcribe_file(audio_path, args.language)))
     return 0
 
 
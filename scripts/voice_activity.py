@@ -0,0 +1,167 @@
+"""
+Energy / zero-crossing voice activity detection for transcribe_with_whisper.py.
+
+Table recordings are mostly silence, pauses and dice noise. `compact_speech`
+finds the speech regions of a 16 kHz mono recording and joins them into one
+shorter array for Whisper, and `SpeechMap` maps timestamps in that shorter
+array back onto the original timeline.
+
+Frames are classified with hysteresis. A region opens on frames that are
+clearly above the estimated noise floor, or loud enough to be speech whatever
+the floor, with a speech-like zero-crossing rate, and it stays open while the
+energy stays above a lower threshold. Short drops are bridged and regions are
+padded so word onsets and tails are not clipped.
+
+The detector only drops audio it can tell apart from speech: a recording with
+too little spread between its quiet and loud frames to estimate a noise floor,
+or one where no region is found, is passed on whole.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+
+FRAME_MS = 30
+NOISE_FLOOR_PERCENTILE = 10
+ENTER_ABOVE_FLOOR_DB = 12.0
+EXIT_ABOVE_FLOOR_DB = 6.0
+MIN_ENTER_DB = -50.0
+MIN_EXIT_DB = -58.0
+# Frames this loud are speech (given a speech-like ZCR) even when the recording
+# has no quiet frames to estimate a noise floor from
+SPEECH_ENTER_DB = -35.0
+SPEECH_EXIT_DB = -45.0
+NOISE_SPREAD_PERCENTILE = 90
+MAX_SPEECH_ZCR = 0.35
+HANGOVER_MS = 300
+MIN_SPEECH_MS = 90
+PAD_MS = 200
+JOIN_SILENCE_MS = 250
+
+
+@dataclass(frozen=True)
+class SpeechMap:
+    """Piecewise mapping from compacted-audio samples to original samples."""
+
+    compact_starts: np.ndarray
+    original_starts: np.ndarray
+    lengths: np.ndarray
+    sample_rate: int
+
+    def to_original_ms(self, compact_ms: int, *, is_end: bool = False) -> int:
+        if self.compact_starts.size == 0:
+            return compact_ms
+
+        sample = compact_ms * self.sample_rate / 1000
+        side = "left" if is_end else "right"
+        index = max(0, int(np.searchsorted(self.compact_starts, sample, side=side)) - 1)
+        offset = min(max(sample - self.compact_starts[index], 0), self.lengths[index])
+        return int(round((self.original_starts[index] + offset) * 1000 / self.sample_rate))
+
+
+@dataclass(frozen=True)
+class CompactedSpeech:
+    audio: np.ndarray
+    speech_map: SpeechMap
+    original_ms: int
+    speech_ms: int
+
+    @property
+    def skipped_ms(self) -> int:
+        return self.original_ms - self.speech_ms
+
+
+def detect_speech_regions(audio: np.ndarray, sample_rate: int) -> list[tuple[int, int]]:
+    """Return `(start, end)` sample ranges that contain speech, padded and merged.
+
+    The whole recording is one range when its energy spread is too small to
+    separate speech from a noise floor.
+    """
+    frame_size = max(1, sample_rate * FRAME_MS // 1000)
+    frame_count = audio.size // frame_size
+    if frame_count == 0:
+        return []
+
+    frames = audio[: frame_count * frame_size].reshape(frame_count, frame_size)
+    energy_db = 10 * np.log10(np.mean(np.square(frames, dtype=np.float32), axis=1) + 1e-10)
+    zcr = np.count_nonzero(np.diff(np.signbit(frames), axis=1), axis=1) / frame_size
+
+    floor_db, loud_db = np.percentile(energy_db, [NOISE_FLOOR_PERCENTILE, NOISE_SPREAD_PERCENTILE])
+    if loud_db - floor_db < ENTER_ABOVE_FLOOR_DB:
+        return [(0, audio.size)]
+
+    enter_db = min(max(float(floor_db) + ENTER_ABOVE_FLOOR_DB, MIN_ENTER_DB), SPEECH_ENTER_DB)
+    exit_db = min(max(float(floor_db) + EXIT_ABOVE_FLOOR_DB, MIN_EXIT_DB), SPEECH_EXIT_DB)
+
+    entering = (energy_db >= enter_db) & (zcr <= MAX_SPEECH_ZCR)
+    sustaining = energy_db >= exit_db
+
+    # Bridge short drops below the exit threshold before looking for runs.
+    hangover = max(1, HANGOVER_MS // FRAME_MS)
+    sustaining = _close_gaps(sustaining, hangover)
+
+    edges = np.diff(sustaining.astype(np.int8), prepend=0, append=0)
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)
+    entering_counts = np.concatenate(([0], np.cumsum(entering)))
+    min_frames = max(1, MIN_SPEECH_MS // FRAME_MS)
+    voiced = entering_counts[run_ends] - entering_counts[run_starts] >= min_frames
+
+    pad = sample_rate * PAD_MS // 1000
+    regions: list[tuple[int, int]] = []
+    for start_frame, end_frame in zip(run_starts[voiced], run_ends[voiced]):
+        start = max(0, int(start_frame) * frame_size - pad)
+        end = min(audio.size, int(end_frame) * frame_size + pad)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+
+    return regions
+
+
+def compact_speech(audio: np.ndarray, sample_rate: int) -> CompactedSpeech:
+    # Finding nothing is more likely a miss than a silent recording; let the
+    # model decide
+    regions = detect_speech_regions(audio, sample_rate) or [(0, audio.size)]
+    join = np.zeros(sample_rate * JOIN_SILENCE_MS // 1000, dtype=audio.dtype)
+
+    pieces = []
+    compact_starts = []
+    cursor = 0
+    for index, (start, end) in enumerate(regions):
+        if index:
+            pieces.append(join)
+            cursor += join.size
+        compact_starts.append(cursor)
+        pieces.append(audio[start:end])
+        cursor += end - start
+
+    lengths = np.array([end - start for start, end in regions], dtype=np.int64)
+    speech_map = SpeechMap(
+        compact_starts=np.array(compact_starts, dtype=np.int64),
+        original_starts=np.array([start for start, _ in regions], dtype=np.int64),
+        lengths=lengths,
+        sample_rate=sample_rate,
+    )
+    compacted = np.concatenate(pieces) if pieces else np.empty(0, dtype=audio.dtype)
+    return CompactedSpeech(
+        audio=compacted,
+        speech_map=speech_map,
+        original_ms=int(round(audio.size * 1000 / sample_rate)),
+        speech_ms=int(round(int(lengths.sum()) * 1000 / sample_rate)),
+    )
+
+
+def _close_gaps(mask: np.ndarray, max_gap: int) -> np.ndarray:
+    edges = np.diff(mask.astype(np.int8), prepend=0, append=0)
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)
+    closed = mask.copy()
+    for gap_start, gap_end in zip(run_ends[:-1], run_starts[1:]):
+        if gap_end - gap_start <= max_gap:
+            closed[gap_start:gap_end] = True
+    return closed
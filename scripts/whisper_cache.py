@@ -0,0 +1,117 @@
+"""
+Content-addressed on-disk cache for transcribe_with_whisper.py results.
+
+Entries are keyed by a SHA-256 of the audio bytes plus the options that affect
+the transcript (model, language, decode options), so a renamed or copied WAV
+still hits and any option change misses. Each entry is a small JSON file
+written atomically (temp file + rename), which keeps concurrent runs safe.
+Least-recently-used entries are evicted once the cache grows past its size cap.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+
+CACHE_FORMAT_VERSION = 1
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def default_cache_dir() -> Path:
+    configured = os.environ.get("WHISPER_CACHE_DIR", "").strip()
+    if configured:
+        return Path(configured)
+
+    cache_home = os.environ.get("XDG_CACHE_HOME", "").strip()
+    base = Path(cache_home) if cache_home else Path.home() / ".cache"
+    return base / "ruleflow-whisper"
+
+
+def cache_key(audio_path: Path, options: dict) -> str:
+    digest = hashlib.sha256()
+    digest.update(
+        json.dumps({"format": CACHE_FORMAT_VERSION, **options}, sort_keys=True).encode("utf-8")
+    )
+    digest.update(b"\0")
+
+    with audio_path.open("rb") as audio_file:
+        while block := audio_file.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    def __init__(self, directory: Path, max_bytes: int = DEFAULT_CACHE_MAX_BYTES) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def entry_path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> dict | None:
+        path = self.entry_path(key)
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            # A damaged entry is treated as a miss and overwritten by the next put.
+            return None
+
+        try:
+            # mtime doubles as the LRU clock; atime is unreliable on noatime mounts.
+            os.utime(path)
+        except OSError:
+            pass
+
+        return payload if isinstance(payload, dict) else None
+
+    def put(self, key: str, payload: dict) -> None:
+        path = self.entry_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as temp_file:
+                json.dump(payload, temp_file)
+            os.replace(temp_name, path)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+
+        self.evict()
+
+    def entries(self) -> list[tuple[float, int, Path]]:
+        found = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:  # removed by a concurrent run
+                continue
+            found.append((stat.st_mtime, stat.st_size, path))
+        return found
+
+    def evict(self) -> None:
+        entries = self.entries()
+        total_bytes = sum(size for _, size, _ in entries)
+        if total_bytes <= self.max_bytes:
+            return
+
+        for _, size, path in sorted(entries):
+            path.unlink(missing_ok=True)
+            total_bytes -= size
+            if total_bytes <= self.max_bytes:
+                break
+
+    def clear(self) -> int:
+        removed = 0
+        for _, _, path in self.entries():
+            path.unlink(missing_ok=True)
+            removed += 1
+        return removed
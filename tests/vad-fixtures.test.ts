@@ -0,0 +1,59 @@
+/**
+ * Voice activity pre-pass checks on the audio fixtures.
+ *
+ * Runs scripts/check_vad_fixtures.py: without a Whisper model the detected
+ * speech regions must cover each fixture's speech and compacted timestamps
+ * must map back onto the original timeline; with tiny.en, transcribing with
+ * --vad must give the same segments as without. Skipped when uv, or for the
+ * Whisper check the downloaded tiny.en model, is missing.
+ */
+import { execFileSync, spawnSync } from "node:child_process"
+import { existsSync } from "node:fs"
+import { homedir } from "node:os"
+import { join } from "node:path"
+import { fileURLToPath } from "node:url"
+
+import { describe, expect, it } from "@effect/vitest"
+
+const uvBinary = process.env["WHISPER_UV_BINARY"] ?? "uv"
+const checkScriptPath = fileURLToPath(new URL("../scripts/check_vad_fixtures.py", import.meta.url))
+const hasUv = spawnSync(uvBinary, ["--version"]).status === 0
+// openai-whisper keeps downloaded models in $XDG_CACHE_HOME/whisper
+const whisperModelPath = join(process.env["XDG_CACHE_HOME"] ?? join(homedir(), ".cache"), "whisper", "tiny.en.pt")
+const hasWhisperModel = existsSync(whisperModelPath)
+
+describe("voice activity pre-pass", () => {
+  it.skipIf(!hasUv)("keeps the speech of non-action-think.wav and attack-goblin.wav", () => {
+    const output = execFileSync(
+      uvBinary,
+      ["run", "--quiet", "--with", "numpy", "python", checkScriptPath],
+      { encoding: "utf8" }
+    )
+
+    expect(output).not.toContain("FAIL")
+    expect(output.match(/^\s+ok\s/gm)).toHaveLength(3)
+  }, 120_000)
+
+  it.skipIf(!hasUv || !hasWhisperModel)("gives the same tiny.en segments with and without --vad", () => {
+    const output = execFileSync(
+      uvBinary,
+      [
+        "run",
+        "--quiet",
+        "--with",
+        "openai-whisper",
+        "--with",
+        "numpy",
+        "python",
+        checkScriptPath,
+        "--whisper",
+        "--model",
+        "tiny.en"
+      ],
+      { encoding: "utf8" }
+    )
+
+    expect(output).not.toContain("FAIL")
+    expect(output.match(/^\s+ok\s.*whisper with and without --vad$/gm)).toHaveLength(2)
+  }, 600_000)
+})